@@ -0,0 +1,65 @@
+import threading
+from bisect import bisect_left
+
+from recipes.models import Ingredient
+
+from .cache import get_version
+from .constants import INGREDIENT_SEARCH_LIMIT
+
+
+class IngredientIndex:
+    """Индекс ингредиентов в памяти процесса для автодополнения.
+
+    Хранит отсортированные названия в нижнем регистре; префикс ищется
+    бинарным поиском. Индекс перестраивается при смене версии каталога
+    ингредиентов (см. api.signals).
+    """
+
+    def __init__(self):
+        self._version = None
+        self._data = ([], [])
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        version = get_version('ingredients')
+        if version == self._version:
+            return
+        with self._lock:
+            if version == self._version:
+                return
+            rows = sorted(
+                (name.casefold(), pk, name, unit)
+                for pk, name, unit in Ingredient.objects.values_list(
+                    'id', 'name', 'measurement_unit'
+                )
+            )
+            self._data = (
+                [row[0] for row in rows],
+                [
+                    {'id': pk, 'name': name, 'measurement_unit': unit}
+                    for _, pk, name, unit in rows
+                ]
+            )
+            self._version = version
+
+    def search(self, query, limit=INGREDIENT_SEARCH_LIMIT):
+        """Совпадения по началу названия, затем по подстроке."""
+        self._refresh()
+        keys, items = self._data
+        query = query.casefold()
+        result = []
+        index = bisect_left(keys, query)
+        while (index < len(keys) and len(result) < limit
+               and keys[index].startswith(query)):
+            result.append(items[index])
+            index += 1
+        if len(result) < limit:
+            for key, item in zip(keys, items):
+                if query in key and not key.startswith(query):
+                    result.append(item)
+                    if len(result) == limit:
+                        break
+        return result
+
+
+ingredient_index = IngredientIndex()
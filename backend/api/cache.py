@@ -0,0 +1,166 @@
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from .constants import (CATALOG_CACHE_TIMEOUT, RECIPE_DETAIL_CACHE_TIMEOUT,
+                        RECIPE_LIST_LOCK_TIMEOUT)
+from .metrics import metrics
+
+
+VERSION_KEY = 'version:{}'
+CATALOG_KEY = 'catalog:{}:{}'
+RECIPE_VERSION = 'recipe:{}'
+RECIPE_DETAIL_KEY = 'recipe_detail:{}:{}:{}:{}:{}'
+RECIPE_LIST_KEY = 'recipe_list:{}:{}'
+RECIPE_LIST_LOCK_KEY = 'recipe_list_lock:{}:{}'
+
+_local_catalogs = {}
+
+
+def get_version(name):
+    """Возвращает текущую версию набора данных из общего кэша."""
+    key = VERSION_KEY.format(name)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(name):
+    """Меняет версию набора данных, инвалидируя все его кэши."""
+    key = VERSION_KEY.format(name)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), timeout=None)
+
+
+def get_versions(*names, optional=()):
+    """Версии нескольких наборов данных за одно обращение к кэшу.
+
+    Отсутствующая версия набора из optional считается нулевой и в кэш
+    не записывается: ее создает только bump_version.
+    """
+    keys = [VERSION_KEY.format(name) for name in names]
+    found = cache.get_many(keys)
+    return [
+        found[key] if key in found
+        else 0 if name in optional
+        else get_version(name)
+        for key, name in zip(keys, names)
+    ]
+
+
+def invalidate_recipe_details(pks):
+    """Сбрасывает закэшированные карточки рецептов."""
+    for pk in pks:
+        bump_version(RECIPE_VERSION.format(pk))
+
+
+def recipe_detail_key(request, pk):
+    """Ключ карточки рецепта.
+
+    В ключ входят версии тегов, ингредиентов и самого рецепта, а также
+    хост: ссылки на картинки в ответе абсолютные. Версия рецепта
+    не заводится при чтении, иначе каждый запрос несуществующего pk
+    оставлял бы в кэше вечный ключ.
+    """
+    recipe_version = RECIPE_VERSION.format(pk)
+    versions = get_versions(
+        'tags', 'ingredients', recipe_version, optional=(recipe_version,)
+    )
+    return RECIPE_DETAIL_KEY.format(request.get_host(), *versions, pk)
+
+
+def get_recipe_detail(key):
+    """Общая для всех пользователей часть карточки рецепта или None."""
+    data = cache.get(key)
+    if data is None:
+        metrics.increment('recipe_detail_cache_misses_total')
+    else:
+        metrics.increment('recipe_detail_cache_hits_total')
+    return data
+
+
+def set_recipe_detail(key, data):
+    """Кэширует карточку рецепта без флагов текущего пользователя."""
+    data = dict(
+        data,
+        is_favorited=False,
+        is_in_shopping_cart=False,
+        author=dict(data['author'], is_subscribed=False)
+    )
+    cache.set(key, data, timeout=RECIPE_DETAIL_CACHE_TIMEOUT)
+
+
+def get_recipe_list(request, build):
+    """Список рецептов для анонимного пользователя из кэша.
+
+    Ключ - нормализованная строка запроса, в записи хранится поколение
+    данных ('recipe_list', теги, ингредиенты). Устаревшую запись
+    пересобирает один запрос, взявший блокировку, остальные тем временем
+    получают старый ответ. build() возвращает Response, кэшируются
+    только успешные ответы.
+    """
+    generation = ':'.join(
+        map(str, get_versions('recipe_list', 'tags', 'ingredients'))
+    )
+    query = hashlib.md5(urlencode(sorted(
+        (name, value)
+        for name, values in request.GET.lists() for value in values
+    )).encode()).hexdigest()
+    key = RECIPE_LIST_KEY.format(request.get_host(), query)
+    lock_key = RECIPE_LIST_LOCK_KEY.format(request.get_host(), query)
+    locked = False
+    entry = cache.get(key)
+    if entry is not None:
+        entry_generation, expires, data = entry
+        if entry_generation == generation and expires > time.time():
+            metrics.increment('recipe_list_cache_hits_total')
+            return Response(data)
+        if settings.RECIPE_LIST_CACHE_STALE:
+            locked = cache.add(lock_key, 1, RECIPE_LIST_LOCK_TIMEOUT)
+            if not locked:
+                metrics.increment('recipe_list_cache_stale_total')
+                return Response(data)
+    metrics.increment('recipe_list_cache_misses_total')
+    try:
+        response = build()
+        if response.status_code == 200:
+            cache.set(
+                key,
+                (generation, time.time() + settings.RECIPE_LIST_CACHE_TIMEOUT,
+                 response.data),
+                timeout=(settings.RECIPE_LIST_CACHE_TIMEOUT
+                         + settings.RECIPE_LIST_CACHE_STALE)
+            )
+    finally:
+        if locked:
+            cache.delete(lock_key)
+    return response
+
+
+def get_catalog(name, build):
+    """Возвращает готовый JSON каталога и его ETag.
+
+    Сначала проверяется кэш процесса, затем общий кэш; при промахе
+    данные строятся через build() и сохраняются в обоих.
+    """
+    version = get_version(name)
+    local = _local_catalogs.get(name)
+    if local is not None and local[0] == version:
+        return local[1]
+    key = CATALOG_KEY.format(name, version)
+    entry = cache.get(key)
+    if entry is None:
+        body = JSONRenderer().render(build())
+        entry = (body, f'"{hashlib.sha256(body).hexdigest()}"')
+        cache.set(key, entry, timeout=CATALOG_CACHE_TIMEOUT)
+    _local_catalogs[name] = (version, entry)
+    return entry
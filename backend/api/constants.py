@@ -1 +1,24 @@
 PAGE_LIMIT = 6
+
+CATALOG_CACHE_TIMEOUT = 60 * 60 * 24
+RECIPE_DETAIL_CACHE_TIMEOUT = 60 * 60
+RECIPE_LIST_LOCK_TIMEOUT = 10
+
+INGREDIENT_SEARCH_LIMIT = 50
+
+SHOPPING_LIST_CHUNK_SIZE = 8192
+
+BASE64_CHUNK_SIZE = 64 * 1024
+DATA_URI_HEADER_MAX_LENGTH = 100
+IMAGE_WORKERS = 2
+IMAGE_VARIANTS = {
+    'thumbnail': ((200, 200), 'JPEG'),
+    'medium': ((600, 600), 'JPEG'),
+    'webp': ((1200, 1200), 'WEBP'),
+}
+
+MATCH_INDEX_REFRESH_INTERVAL = 60
+
+N_PLUS_ONE_THRESHOLD = 10
+
+BULK_RECIPES_LIMIT = 100
@@ -1,17 +1,128 @@
-import base64
+import binascii
 import uuid
+from base64 import b64decode
+from io import BytesIO
 
-from django.core.files.base import ContentFile
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import (InMemoryUploadedFile,
+                                            TemporaryUploadedFile)
 from rest_framework import serializers
 
+from .constants import BASE64_CHUNK_SIZE, DATA_URI_HEADER_MAX_LENGTH
+
 
 class Base64ImageField(serializers.ImageField):
+    """Картинка в виде data URI: data:image/png;base64,....
+
+    Тип и размер проверяются до декодирования; данные декодируются
+    кусками во временный файл, который при большом размере лежит на
+    диске, как обычная загрузка файла в Django. Переводы строк и пробелы
+    внутри base64 допускаются.
+    """
+    default_error_messages = {
+        'image_too_large': (
+            'Размер картинки не должен превышать {max_size} МБ.'
+        ),
+        'image_type': 'Недопустимый тип картинки: {content_type}.',
+        'invalid_base64': 'Некорректные данные картинки.',
+    }
+
+    def __init__(self, *args, max_size=None, allowed_types=None, **kwargs):
+        self.max_size = max_size or settings.MAX_IMAGE_SIZE
+        self.allowed_types = allowed_types or settings.ALLOWED_IMAGE_TYPES
+        super().__init__(*args, **kwargs)
+
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format_part, imgstr = data.split(';base64,')
-            ext = format_part.split('/')[-1]
-            data = ContentFile(
-                base64.b64decode(imgstr),
-                name=f'{uuid.uuid4()}.{ext}'
-            )
+            data = self.decode(data)
         return super().to_internal_value(data)
+
+    def decode(self, data):
+        header_end = data.find(',', 0, DATA_URI_HEADER_MAX_LENGTH)
+        content_type, _, encoding = data[5:header_end].partition(';')
+        if header_end == -1 or encoding != 'base64':
+            self.fail('invalid_base64')
+        if content_type not in self.allowed_types:
+            self.fail('image_type', content_type=content_type)
+        size = (
+            len(data) - header_end - 1 - data.count('\n', header_end)
+        ) * 3 // 4
+        if size > self.max_size:
+            self.fail(
+                'image_too_large', max_size=self.max_size // (1024 * 1024)
+            )
+        name = f'{uuid.uuid4()}.{content_type.split("/")[-1]}'
+        if size > settings.FILE_UPLOAD_MAX_MEMORY_SIZE:
+            file = TemporaryUploadedFile(name, content_type, size, None)
+        else:
+            file = InMemoryUploadedFile(
+                BytesIO(), None, name, content_type, size, None
+            )
+        # Без пробелов длина куска может быть не кратна 4, поэтому хвост
+        # переносится в начало следующего.
+        pending = ''
+        try:
+            for start in range(header_end + 1, len(data), BASE64_CHUNK_SIZE):
+                chunk = pending + ''.join(
+                    data[start:start + BASE64_CHUNK_SIZE].split()
+                )
+                aligned = len(chunk) - len(chunk) % 4
+                file.write(b64decode(chunk[:aligned], validate=True))
+                pending = chunk[aligned:]
+            if pending:
+                raise binascii.Error('Incomplete base64 data')
+        except (binascii.Error, ValueError):
+            file.close()
+            self.fail('invalid_base64')
+        file.size = file.tell()
+        file.seek(0)
+        return file
+
+
+def resolve_pks(queryset, pks):
+    """Объекты по списку id одним запросом, в порядке списка.
+
+    Если части id нет в базе, ошибка перечисляет их все сразу.
+    """
+    objects = queryset.in_bulk(set(pks))
+    missing = [pk for pk in dict.fromkeys(pks) if pk not in objects]
+    if missing:
+        raise serializers.ValidationError(
+            f'Не существуют объекты с id: {", ".join(map(str, missing))}.'
+        )
+    return [objects[pk] for pk in pks]
+
+
+class BulkPrimaryKeyRelatedField(serializers.ListField):
+    """Список id, которые превращаются в объекты одним запросом IN.
+
+    PrimaryKeyRelatedField(many=True) делает отдельный SELECT на каждый id.
+    """
+    child = serializers.IntegerField(min_value=1)
+
+    def __init__(self, queryset, **kwargs):
+        self.queryset = queryset
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        return resolve_pks(
+            self.queryset.all(), super().to_internal_value(data)
+        )
+
+    def to_representation(self, value):
+        if hasattr(value, 'all'):
+            value = value.all()
+        return [item.pk for item in value]
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    """Ссылки на уменьшенные варианты картинки."""
+
+    def to_representation(self, value):
+        request = self.context.get('request')
+        urls = {}
+        for variant, name in (value or {}).items():
+            url = default_storage.url(name)
+            urls[variant] = request.build_absolute_uri(url) if request else url
+        return urls
@@ -1,6 +1,8 @@
 from django_filters import rest_framework as filters
+from rest_framework.filters import OrderingFilter
 
 from recipes.models import Ingredient, Recipe, Tag
+from recipes.search import is_search_ranked, search_recipes
 
 
 class RecipeFilter(filters.FilterSet):
@@ -13,6 +15,7 @@ class RecipeFilter(filters.FilterSet):
     is_in_shopping_cart = filters.NumberFilter(
         method='filter_is_in_shopping_cart'
     )
+    search = filters.CharFilter(method='filter_search')
 
     class Meta:
         model = Recipe
@@ -34,6 +37,9 @@ class RecipeFilter(filters.FilterSet):
             return queryset.filter(in_shopping_cart__user=user)
         return queryset
 
+    def filter_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
 
 class IngredientFilter(filters.FilterSet):
     name = filters.CharFilter(field_name='name', lookup_expr='istartswith')
@@ -41,3 +47,19 @@ class IngredientFilter(filters.FilterSet):
     class Meta:
         model = Ingredient
         fields = ('name',)
+
+
+class RecipeOrderingFilter(OrderingFilter):
+    """Сортировка рецептов с id в конце для устойчивой пагинации.
+
+    При поиске без явного ?ordering= рецепты сортируются по релевантности.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        if (not request.query_params.get(self.ordering_param)
+                and is_search_ranked(queryset)):
+            return ['-search_rank', '-id']
+        ordering = list(super().get_ordering(request, queryset, view))
+        if not {'id', '-id'} & set(ordering):
+            ordering.append('-id')
+        return ordering
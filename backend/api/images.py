@@ -0,0 +1,104 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.dispatch import Signal
+from PIL import Image
+
+from .constants import IMAGE_VARIANTS, IMAGE_WORKERS
+
+
+logger = logging.getLogger(__name__)
+
+# Отправляется после записи вариантов: sender - модель, pk - объект.
+variants_built = Signal()
+
+_executor = ThreadPoolExecutor(
+    max_workers=IMAGE_WORKERS, thread_name_prefix='images'
+)
+
+
+def run_in_background(func, *args):
+    """Выполняет func(*args) в фоновом потоке после коммита транзакции."""
+    transaction.on_commit(lambda: _executor.submit(_run, func, args))
+
+
+def _run(func, args):
+    close_old_connections()
+    try:
+        func(*args)
+    except Exception:
+        logger.exception('Ошибка фоновой задачи %s', func.__name__)
+    finally:
+        close_old_connections()
+
+
+def schedule_variants(instance, field_name, variants_field):
+    """Ставит в очередь построение вариантов картинки после коммита."""
+    name = getattr(instance, field_name).name
+    if not name:
+        return
+    transaction.on_commit(lambda: _executor.submit(
+        build_variants, type(instance), instance.pk,
+        field_name, variants_field, name
+    ))
+
+
+def delete_variants(instance, field_name, variants_field):
+    """Удаляет файлы вариантов картинки после коммита.
+
+    Вызывается перед сбросом поля вариантов и после удаления объекта.
+    """
+    names = list((getattr(instance, variants_field) or {}).values())
+    if not names:
+        return
+    storage = instance._meta.get_field(field_name).storage
+    transaction.on_commit(lambda: _delete_files(storage, names))
+
+
+def _delete_files(storage, names):
+    for name in names:
+        try:
+            storage.delete(name)
+        except OSError:
+            logger.exception('Не удалось удалить файл %s', name)
+
+
+def build_variants(model, pk, field_name, variants_field, name):
+    """Строит уменьшенные варианты картинки и сохраняет их пути."""
+    close_old_connections()
+    try:
+        storage = model._meta.get_field(field_name).storage
+        with storage.open(name) as file:
+            image = Image.open(file)
+            image.load()
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.mode else 'RGB')
+        base = os.path.splitext(name)[0]
+        variants = {}
+        for variant, (size, image_format) in IMAGE_VARIANTS.items():
+            copy = image.copy()
+            copy.thumbnail(size)
+            if image_format == 'JPEG':
+                copy = copy.convert('RGB')
+            buffer = BytesIO()
+            copy.save(buffer, image_format, quality=85)
+            extension = 'jpg' if image_format == 'JPEG' else 'webp'
+            variants[variant] = storage.save(
+                f'{base}_{variant}.{extension}',
+                ContentFile(buffer.getvalue())
+            )
+        # Если картинку успели заменить, варианты уже не актуальны.
+        if model.objects.filter(pk=pk, **{field_name: name}).update(
+            **{variants_field: variants}
+        ):
+            variants_built.send(sender=model, pk=pk)
+        else:
+            _delete_files(storage, variants.values())
+    except Exception:
+        logger.exception('Не удалось обработать картинку %s', name)
+    finally:
+        close_old_connections()
@@ -0,0 +1,71 @@
+import threading
+import time
+from array import array
+from collections import Counter
+
+from recipes.models import RecipeIngredient
+
+from .cache import get_version
+from .constants import MATCH_INDEX_REFRESH_INTERVAL
+
+
+class RecipeMatchIndex:
+    """Инвертированный индекс ингредиент -> рецепты в памяти процесса.
+
+    Для каждого ингредиента хранится отсортированный массив id рецептов,
+    для каждого рецепта - число его ингредиентов. Индекс перестраивается
+    при смене версии 'recipe_ingredients', но не чаще, чем раз в
+    MATCH_INDEX_REFRESH_INTERVAL секунд.
+    """
+
+    def __init__(self):
+        self._version = None
+        self._built_at = 0
+        self._data = ({}, {})
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        version = get_version('recipe_ingredients')
+        if version == self._version or (
+            self._version is not None
+            and time.monotonic() - self._built_at
+            < MATCH_INDEX_REFRESH_INTERVAL
+        ):
+            return
+        with self._lock:
+            if version == self._version:
+                return
+            postings = {}
+            sizes = Counter()
+            rows = RecipeIngredient.objects.order_by(
+                'ingredient_id', 'recipe_id'
+            ).values_list('ingredient_id', 'recipe_id').iterator()
+            for ingredient_id, recipe_id in rows:
+                postings.setdefault(ingredient_id, array('q')).append(
+                    recipe_id
+                )
+                sizes[recipe_id] += 1
+            self._data = (postings, sizes)
+            self._version = version
+            self._built_at = time.monotonic()
+
+    def match(self, ingredient_ids):
+        """Возвращает [(recipe_id, coverage)] по убыванию покрытия.
+
+        Покрытие - доля ингредиентов рецепта, которые есть у
+        пользователя.
+        """
+        self._refresh()
+        postings, sizes = self._data
+        matched = Counter()
+        for ingredient_id in set(ingredient_ids):
+            matched.update(postings.get(ingredient_id, ()))
+        result = [
+            (recipe_id, count / sizes[recipe_id], count)
+            for recipe_id, count in matched.items()
+        ]
+        result.sort(key=lambda item: (-item[1], -item[2], -item[0]))
+        return [(recipe_id, coverage) for recipe_id, coverage, _ in result]
+
+
+recipe_match_index = RecipeMatchIndex()
@@ -0,0 +1,58 @@
+import threading
+from collections import defaultdict
+
+
+VIEW_METRICS = (
+    ('requests_total', 'Количество запросов'),
+    ('db_queries_total', 'Количество SQL-запросов'),
+    ('db_seconds_total', 'Время в базе данных, с'),
+    ('serialize_seconds_total', 'Время сериализации данных, с'),
+    ('render_seconds_total', 'Время рендеринга ответа, с'),
+    ('request_seconds_total', 'Полное время обработки, с'),
+    ('response_bytes_total', 'Размер ответов, байт'),
+)
+
+
+class Metrics:
+    """Счетчики процесса в формате Prometheus."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = defaultdict(lambda: [0] * len(VIEW_METRICS))
+        self._counters = defaultdict(int)
+
+    def observe(self, view, queries, db_time, serialize_time, render_time,
+                duration, size):
+        with self._lock:
+            values = self._views[view]
+            for index, value in enumerate((
+                1, queries, db_time, serialize_time, render_time,
+                duration, size
+            )):
+                values[index] += value
+
+    def increment(self, name, value=1):
+        with self._lock:
+            self._counters[name] += value
+
+    def render(self):
+        with self._lock:
+            views = {
+                view: list(values) for view, values in self._views.items()
+            }
+            counters = dict(self._counters)
+        lines = []
+        for index, (name, help_text) in enumerate(VIEW_METRICS):
+            lines.append(f'# HELP foodgram_{name} {help_text}')
+            lines.append(f'# TYPE foodgram_{name} counter')
+            for view, values in sorted(views.items()):
+                lines.append(
+                    f'foodgram_{name}{{view="{view}"}} {values[index]}'
+                )
+        for name, value in sorted(counters.items()):
+            lines.append(f'# TYPE foodgram_{name} counter')
+            lines.append(f'foodgram_{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
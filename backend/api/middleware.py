@@ -0,0 +1,126 @@
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.db import connection
+
+from .constants import N_PLUS_ONE_THRESHOLD
+from .metrics import metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+class QueryTracker:
+    """Обертка execute_wrapper: считает запросы, время и их шаблоны."""
+
+    def __init__(self):
+        self.count = 0
+        self.db_time = 0
+        self.serialize_time = 0
+        self.render_time = 0
+        self.shapes = Counter()
+        self._serializing = False
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.count += 1
+            self.shapes[sql] += 1
+
+    @contextmanager
+    def serializing(self):
+        """Засчитывает время сериализации; вложенные вызовы не суммируются."""
+        if self._serializing:
+            yield
+            return
+        self._serializing = True
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.serialize_time += time.perf_counter() - started
+            self._serializing = False
+
+
+class QueryInstrumentationMiddleware:
+    """Собирает по view число запросов, время БД, сериализации, рендеринга
+    и ответа.
+
+    Значения отдаются в заголовке Server-Timing и копятся в метриках
+    для /metrics; повторяющиеся одинаковые запросы пишутся в лог как
+    возможный N+1.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        tracker = QueryTracker()
+        request._query_tracker = tracker
+        started = time.perf_counter()
+        with connection.execute_wrapper(tracker):
+            response = self.get_response(request)
+        self._set_server_timing(response, tracker, started)
+        if response.streaming:
+            # Запросы потокового ответа выполняются, пока его читают,
+            # поэтому метрики пишутся, когда поток исчерпан.
+            response.streaming_content = self._track_stream(
+                request, response.streaming_content, tracker, started
+            )
+        else:
+            self._record(request, tracker, started, len(response.content))
+        return response
+
+    def _track_stream(self, request, content, tracker, started):
+        size = 0
+        try:
+            with connection.execute_wrapper(tracker):
+                for chunk in content:
+                    size += len(chunk)
+                    yield chunk
+        finally:
+            self._record(request, tracker, started, size)
+
+    def _set_server_timing(self, response, tracker, started):
+        # У потокового ответа заголовок уходит раньше тела, поэтому в нем
+        # только то, что успело выполниться до начала потока.
+        duration = time.perf_counter() - started
+        response['Server-Timing'] = (
+            f'db;dur={tracker.db_time * 1000:.1f};'
+            f'desc="{tracker.count} queries", '
+            f'serialize;dur={tracker.serialize_time * 1000:.1f}, '
+            f'render;dur={tracker.render_time * 1000:.1f}, '
+            f'total;dur={duration * 1000:.1f}'
+        )
+
+    def _record(self, request, tracker, started, size):
+        duration = time.perf_counter() - started
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        metrics.observe(
+            view, tracker.count, tracker.db_time, tracker.serialize_time,
+            tracker.render_time, duration, size
+        )
+        if tracker.shapes:
+            sql, repeats = tracker.shapes.most_common(1)[0]
+            if repeats >= N_PLUS_ONE_THRESHOLD:
+                logger.warning(
+                    'Возможный N+1 в %s: %d одинаковых запросов: %s',
+                    view, repeats, sql[:300]
+                )
+
+    def process_template_response(self, request, response):
+        tracker = getattr(request, '_query_tracker', None)
+        if tracker is not None:
+            started = time.perf_counter()
+
+            def finish_render(response):
+                tracker.render_time += time.perf_counter() - started
+
+            response.add_post_render_callback(finish_render)
+        return response
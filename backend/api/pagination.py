@@ -1,4 +1,4 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 
 from .constants import PAGE_LIMIT
 
@@ -6,3 +6,25 @@ from .constants import PAGE_LIMIT
 class LimitPageNumberPagination(PageNumberPagination):
     page_size = PAGE_LIMIT
     page_size_query_param = 'limit'
+
+
+class RecipeCursorPagination(CursorPagination):
+    """Keyset-пагинация ленты рецептов без OFFSET и COUNT(*).
+
+    Включается параметром ?pagination=cursor; ссылки next/previous
+    сохраняют его вместе с остальными параметрами запроса.
+    """
+    page_size = PAGE_LIMIT
+    page_size_query_param = 'limit'
+    ordering = ('-pub_date', '-id')
+    mode_query_param = 'pagination'
+    mode = 'cursor'
+
+    @classmethod
+    def is_requested(cls, request):
+        return request.query_params.get(cls.mode_query_param) == cls.mode
+
+
+class FeedCursorPagination(RecipeCursorPagination):
+    """Keyset-пагинация записей ленты подписок."""
+    ordering = ('-pub_date', '-recipe_id')
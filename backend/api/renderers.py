@@ -0,0 +1,66 @@
+import csv
+
+from rest_framework.renderers import BaseRenderer
+
+
+class ShoppingListRenderer(BaseRenderer):
+    """Базовый рендерер списка покупок.
+
+    Сам список отдается потоком через stream(); render() используется
+    DRF только для ответов с ошибками.
+    """
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if isinstance(data, dict):
+            data = data.get('detail', data)
+        return str(data).encode(self.charset)
+
+    def stream(self, items):
+        """Возвращает генератор строк для строк списка покупок."""
+        raise NotImplementedError
+
+
+class ShoppingListTextRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, items):
+        separator = ''
+        for item in items:
+            yield (
+                f"{separator}{item['ingredient__name']} "
+                f"({item['ingredient__measurement_unit']}) - "
+                f"{item['total']}"
+            )
+            separator = '\n'
+
+
+class _Echo:
+    """Псевдофайл для csv.writer, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+class ShoppingListCSVRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, items):
+        writer = csv.writer(_Echo())
+        # BOM нужен, чтобы Excel распознал UTF-8.
+        yield '\ufeff' + writer.writerow(
+            ('Ингредиент', 'Единица измерения', 'Количество')
+        )
+        for item in items:
+            yield writer.writerow((
+                item['ingredient__name'],
+                item['ingredient__measurement_unit'],
+                item['total']
+            ))
+
+
+SHOPPING_LIST_RENDERERS = (ShoppingListTextRenderer, ShoppingListCSVRenderer)
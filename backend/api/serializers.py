@@ -1,17 +1,36 @@
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from rest_framework import serializers
 
 from recipes.models import (Favourite, Ingredient, Recipe, RecipeIngredient,
                             ShoppingCart, Tag)
 from users.models import Subscription
 
-from .fields import Base64ImageField
+from .cache import recipe_detail_key, set_recipe_detail
+from .constants import BULK_RECIPES_LIMIT
+from .fields import (Base64ImageField, BulkPrimaryKeyRelatedField,
+                     ImageVariantsField, resolve_pks)
+from .images import delete_variants, schedule_variants
+from .utils import get_recipes_limit
 
 
 User = get_user_model()
 
 
-class UserCreateSerializer(serializers.ModelSerializer):
+class TimedSerializerMixin:
+    """Засчитывает время to_representation в метрику сериализации."""
+
+    def to_representation(self, instance):
+        request = self.context.get('request')
+        tracker = getattr(request, '_query_tracker', None)
+        if tracker is None:
+            return super().to_representation(instance)
+        with tracker.serializing():
+            return super().to_representation(instance)
+
+
+class UserCreateSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
 
     class Meta:
@@ -27,41 +46,59 @@ class UserCreateSerializer(serializers.ModelSerializer):
         return super().to_representation(instance)
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField()
     avatar = serializers.ImageField(read_only=True)
+    avatar_variants = ImageVariantsField()
 
     class Meta:
         model = User
         fields = (
             'id', 'email', 'username', 'first_name',
-            'last_name', 'is_subscribed', 'avatar'
+            'last_name', 'is_subscribed', 'avatar', 'avatar_variants'
         )
         read_only_fields = ('is_subscribed', 'avatar')
 
     def get_is_subscribed(self, obj):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return Subscription.objects.filter(
-                user=request.user, author=obj).exists()
+            return obj.id in self.get_subscribed_ids(request)
         return False
 
+    @staticmethod
+    def get_subscribed_ids(request):
+        """Id авторов, на которых подписан пользователь (раз на запрос)."""
+        if not hasattr(request, '_subscribed_ids'):
+            request._subscribed_ids = set(
+                Subscription.objects.filter(
+                    user=request.user
+                ).values_list('author_id', flat=True)
+            )
+        return request._subscribed_ids
+
 
-class AvatarSerializer(serializers.ModelSerializer):
+class AvatarSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     avatar = Base64ImageField()
 
     class Meta:
         model = User
         fields = ('avatar',)
 
+    def update(self, instance, validated_data):
+        delete_variants(instance, 'avatar', 'avatar_variants')
+        instance.avatar_variants = {}
+        instance = super().update(instance, validated_data)
+        schedule_variants(instance, 'avatar', 'avatar_variants')
+        return instance
+
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Tag
         fields = ('id', 'name', 'slug')
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Ingredient
         fields = ('id', 'name', 'measurement_unit')
@@ -80,9 +117,8 @@ class RecipeIngredientReadSerializer(serializers.ModelSerializer):
 
 
 class RecipeIngredientWriteSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all(), source='ingredient'
-    )
+    # Ингредиенты достаются одним запросом в validate_ingredients.
+    id = serializers.IntegerField(min_value=1, source='ingredient')
     amount = serializers.IntegerField(min_value=1)
 
     class Meta:
@@ -90,15 +126,16 @@ class RecipeIngredientWriteSerializer(serializers.ModelSerializer):
         fields = ('id', 'amount')
 
 
-class RecipeShortSerializer(serializers.ModelSerializer):
+class RecipeShortSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     image = serializers.ImageField(read_only=True)
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time')
 
 
-class RecipeReadSerializer(serializers.ModelSerializer):
+class RecipeReadSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     tags = TagSerializer(many=True, read_only=True)
     author = UserSerializer(read_only=True)
     ingredients = RecipeIngredientReadSerializer(
@@ -107,33 +144,56 @@ class RecipeReadSerializer(serializers.ModelSerializer):
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
     image = serializers.ImageField(read_only=True)
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
         fields = (
             'id', 'tags', 'author', 'ingredients', 'is_favorited',
-            'is_in_shopping_cart', 'name', 'image', 'text', 'cooking_time'
+            'is_in_shopping_cart', 'name', 'image', 'image_variants',
+            'text', 'cooking_time'
         )
 
-    def get_is_favorited(self, obj):
+    def _get_flag(self, obj, name, model):
+        """Берет флаг из аннотации queryset, иначе делает запрос."""
+        if hasattr(obj, name):
+            return getattr(obj, name)
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return Favourite.objects.filter(
+            return model.objects.filter(
                 user=request.user, recipe=obj).exists()
         return False
 
+    def get_is_favorited(self, obj):
+        return self._get_flag(obj, 'is_favorited', Favourite)
+
     def get_is_in_shopping_cart(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return ShoppingCart.objects.filter(
-                user=request.user, recipe=obj).exists()
-        return False
+        return self._get_flag(obj, 'is_in_shopping_cart', ShoppingCart)
+
 
+class RecipeMatchSerializer(RecipeReadSerializer):
+    coverage = serializers.FloatField(read_only=True)
 
-class RecipeWriteSerializer(serializers.ModelSerializer):
-    tags = serializers.PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(), many=True
+    class Meta(RecipeReadSerializer.Meta):
+        fields = RecipeReadSerializer.Meta.fields + ('coverage',)
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BULK_RECIPES_LIMIT
     )
+
+
+class IngredientIdsSerializer(serializers.Serializer):
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False
+    )
+
+
+class RecipeWriteSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    tags = BulkPrimaryKeyRelatedField(queryset=Tag.objects.all())
     ingredients = RecipeIngredientWriteSerializer(many=True)
     image = Base64ImageField()
 
@@ -145,11 +205,14 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
     def validate_ingredients(self, value):
         if not value:
             raise serializers.ValidationError('Обязательное поле.')
-        ingredients = [item['ingredient'] for item in value]
-        if len(ingredients) != len(set(ingredients)):
+        ingredient_ids = [item['ingredient'] for item in value]
+        if len(ingredient_ids) != len(set(ingredient_ids)):
             raise serializers.ValidationError(
                 'Ингредиенты должны быть уникальными.'
             )
+        ingredients = resolve_pks(Ingredient.objects.all(), ingredient_ids)
+        for item, ingredient in zip(value, ingredients):
+            item['ingredient'] = ingredient
         return value
 
     def validate_tags(self, value):
@@ -171,6 +234,43 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         ]
         RecipeIngredient.objects.bulk_create(recipe_ingredients)
 
+    def update_ingredients(self, recipe, ingredients_data):
+        """Приводит ингредиенты рецепта к новому списку.
+
+        Пишет только разницу: новые строки добавляются, у изменившихся
+        обновляется количество, лишние удаляются.
+        """
+        # Строки читаются заново внутри транзакции: кэш prefetch из
+        # get_object() мог устареть, пока шел параллельный PATCH.
+        existing = {
+            item.ingredient_id: item
+            for item in RecipeIngredient.objects.select_for_update().filter(
+                recipe=recipe
+            )
+        }
+        to_create = []
+        to_update = []
+        for item in ingredients_data:
+            current = existing.pop(item['ingredient'].id, None)
+            if current is None:
+                to_create.append(RecipeIngredient(
+                    recipe=recipe,
+                    ingredient=item['ingredient'],
+                    amount=item['amount']
+                ))
+            elif current.amount != item['amount']:
+                current.amount = item['amount']
+                to_update.append(current)
+        if existing:
+            RecipeIngredient.objects.filter(
+                pk__in=[item.pk for item in existing.values()]
+            ).delete()
+        if to_update:
+            RecipeIngredient.objects.bulk_update(to_update, ['amount'])
+        if to_create:
+            RecipeIngredient.objects.bulk_create(to_create)
+
+    @transaction.atomic
     def create(self, validated_data):
         ingredients_data = validated_data.pop('ingredients')
         tags_data = validated_data.pop('tags')
@@ -179,24 +279,37 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         )
         recipe.tags.set(tags_data)
         self.create_ingredients(recipe, ingredients_data)
+        schedule_variants(recipe, 'image', 'image_variants')
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         ingredients_data = validated_data.pop('ingredients', None)
         tags_data = validated_data.pop('tags', None)
+        if 'image' in validated_data:
+            delete_variants(instance, 'image', 'image_variants')
+            instance.image_variants = {}
         instance = super().update(instance, validated_data)
+        if 'image' in validated_data:
+            schedule_variants(instance, 'image', 'image_variants')
         if tags_data is not None:
+            # set() сам сравнивает с текущими тегами и пишет только разницу.
             instance.tags.set(tags_data)
         if ingredients_data is not None:
-            instance.recipe_ingredients.all().delete()
-            self.create_ingredients(
-                recipe=instance,
-                ingredients_data=ingredients_data
-            )
+            self.update_ingredients(instance, ingredients_data)
         return instance
 
     def to_representation(self, instance):
-        return RecipeReadSerializer(instance, context=self.context).data
+        # Без этого ответ на запись делает SELECT на каждый ингредиент.
+        prefetch_related_objects([instance], Prefetch(
+            'recipe_ingredients',
+            queryset=RecipeIngredient.objects.select_related('ingredient')
+        ), 'tags')
+        data = RecipeReadSerializer(instance, context=self.context).data
+        request = self.context.get('request')
+        if request is not None:
+            set_recipe_detail(recipe_detail_key(request, instance.pk), data)
+        return data
 
 
 class UserWithRecipesSerializer(UserSerializer):
@@ -207,14 +320,17 @@ class UserWithRecipesSerializer(UserSerializer):
         fields = UserSerializer.Meta.fields + ('recipes', 'recipes_count')
 
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        recipes = obj.recipes.all()
-        if request:
-            limit = request.query_params.get('recipes_limit')
-            if limit and limit.isdigit():
-                recipes = recipes[:int(limit)]
+        recipes = getattr(obj, 'limited_recipes', None)
+        if recipes is None:
+            recipes = obj.recipes.all()
+            request = self.context.get('request')
+            limit = get_recipes_limit(request) if request else None
+            if limit is not None:
+                recipes = recipes[:limit]
         return RecipeShortSerializer(
             recipes, many=True, context=self.context).data
 
     def get_recipes_count(self, obj):
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
         return obj.recipes.count()
@@ -0,0 +1,51 @@
+import threading
+
+from recipes.models import Recipe
+
+from .cache import get_version
+
+
+class RecipeIdBitmap:
+    """Битовая карта id существующих рецептов в памяти процесса.
+
+    Существующие рецепты находятся по ней без запроса к базе. Карта
+    перестраивается при смене версии 'recipe_ids', которую меняют
+    создание и удаление рецептов. К базе обращаются только id больше
+    максимального в карте: такой рецепт мог создать другой процесс,
+    смену версии которого эта карта еще не увидела.
+    """
+
+    def __init__(self):
+        self._version = None
+        # Карта и ее максимальный id меняются одним присваиванием, чтобы
+        # другие потоки не увидели их вразнобой.
+        self._bits = (bytearray(), 0)
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        version = get_version('recipe_ids')
+        if version == self._version:
+            return
+        with self._lock:
+            if version == self._version:
+                return
+            ids = Recipe.objects.order_by('-pk').values_list('pk', flat=True)
+            bits = bytearray()
+            max_id = 0
+            for pk in ids.iterator():
+                if not bits:
+                    bits = bytearray(pk // 8 + 1)
+                    max_id = pk
+                bits[pk >> 3] |= 1 << (pk & 7)
+            self._bits = (bits, max_id)
+            self._version = version
+
+    def __contains__(self, pk):
+        self._refresh()
+        bits, max_id = self._bits
+        if pk > max_id:
+            return Recipe.objects.filter(pk=pk).exists()
+        return pk >= 0 and bool(bits[pk >> 3] & 1 << (pk & 7))
+
+
+recipe_id_bitmap = RecipeIdBitmap()
@@ -0,0 +1,80 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from recipes.models import Ingredient, Recipe, Tag
+
+from .cache import bump_version, invalidate_recipe_details
+from .images import delete_variants, variants_built
+
+
+User = get_user_model()
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def invalidate_tags(**kwargs):
+    bump_version('tags')
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredients(**kwargs):
+    bump_version('ingredients')
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def invalidate_recipe_ingredients(**kwargs):
+    # Ингредиенты рецепта записываются после save(), ждем коммита.
+    transaction.on_commit(lambda: bump_version('recipe_ingredients'))
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def invalidate_recipe_detail(instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: invalidate_recipe_details([pk]))
+    transaction.on_commit(lambda: bump_version('recipe_list'))
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_recipes(instance, created, update_fields=None,
+                              **kwargs):
+    # Вход пользователя обновляет только last_login, карточки не меняются.
+    if created or (update_fields and set(update_fields) <= {'last_login'}):
+        return
+    pks = list(instance.recipes.values_list('pk', flat=True))
+    if pks:
+        transaction.on_commit(lambda: invalidate_recipe_details(pks))
+        transaction.on_commit(lambda: bump_version('recipe_list'))
+
+
+@receiver(variants_built)
+def invalidate_variants(sender, pk, **kwargs):
+    if sender in (Recipe, User):
+        bump_version('recipe_list')
+    if sender is Recipe:
+        invalidate_recipe_details([pk])
+    elif sender is User:
+        invalidate_recipe_details(
+            Recipe.objects.filter(author_id=pk).values_list('pk', flat=True)
+        )
+
+
+@receiver(post_save, sender=Recipe)
+def add_recipe_id(created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: bump_version('recipe_ids'))
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_recipe_id(**kwargs):
+    transaction.on_commit(lambda: bump_version('recipe_ids'))
+
+
+@receiver(post_delete, sender=Recipe)
+def delete_recipe_variants(instance, **kwargs):
+    delete_variants(instance, 'image', 'image_variants')
+
+
+@receiver(post_delete, sender=User)
+def delete_avatar_variants(instance, **kwargs):
+    delete_variants(instance, 'avatar', 'avatar_variants')
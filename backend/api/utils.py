@@ -1,28 +1,75 @@
-from django.http import HttpResponse
+from django.db.models import Count, OuterRef, Prefetch, Subquery
+from django.http import StreamingHttpResponse
 
+from recipes.models import Recipe
 
-def generate_shopping_list_text(ingredients):
-    """Генерирует текст списка покупок."""
-    lines = []
-    for item in ingredients:
-        lines.append(
-            f"{item['ingredient__name']} "
-            f"({item['ingredient__measurement_unit']}) - "
-            f"{item['total']}"
-        )
-    return '\n'.join(lines)
+from .constants import SHOPPING_LIST_CHUNK_SIZE
 
 
-def create_shopping_list_response(ingredients):
-    """Создает HttpResponse со списком покупок."""
-    content = generate_shopping_list_text(ingredients)
-    response = HttpResponse(content, content_type='text/plain')
+def _join_chunks(lines, size=SHOPPING_LIST_CHUNK_SIZE):
+    """Склеивает строки в блоки примерно по size символов."""
+    buffer = []
+    length = 0
+    for line in lines:
+        buffer.append(line)
+        length += len(line)
+        if length >= size:
+            yield ''.join(buffer)
+            buffer = []
+            length = 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def create_shopping_list_response(ingredients, renderer):
+    """Создает потоковый ответ со списком покупок.
+
+    Строки читаются из базы через iterator() и сразу отдаются клиенту,
+    поэтому список целиком в памяти не собирается.
+    """
+    response = StreamingHttpResponse(
+        (
+            chunk.encode(renderer.charset)
+            for chunk in _join_chunks(renderer.stream(ingredients.iterator()))
+        ),
+        content_type=f'{renderer.media_type}; charset={renderer.charset}'
+    )
     response['Content-Disposition'] = (
-        'attachment; filename="shopping_list.txt"'
+        f'attachment; filename="shopping_list.{renderer.format}"'
     )
     return response
 
 
+def get_recipes_limit(request):
+    """Возвращает значение recipes_limit из запроса или None."""
+    limit = request.query_params.get('recipes_limit')
+    if limit and limit.isdigit():
+        return int(limit)
+    return None
+
+
+def with_recipes(authors, limit=None):
+    """Добавляет авторам число рецептов и первые limit рецептов.
+
+    Рецепты всех авторов страницы загружаются одним запросом: лимит
+    применяется коррелированным подзапросом по автору.
+    """
+    recipes = Recipe.objects.all()
+    if limit is not None:
+        recipes = recipes.filter(pk__in=Subquery(
+            Recipe.objects.filter(
+                author=OuterRef('author')
+            ).values('pk')[:limit]
+        ))
+    return authors.annotate(
+        recipes_count=Count('recipes')
+    ).order_by(
+        *authors.model._meta.ordering
+    ).prefetch_related(
+        Prefetch('recipes', queryset=recipes, to_attr='limited_recipes')
+    )
+
+
 def to_base36(num):
     chars = '0123456789abcdefghijklmnopqrstuvwxyz'
     if num == 0:
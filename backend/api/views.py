@@ -1,72 +1,204 @@
 from http import HTTPStatus
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
-from django.http import HttpResponse, HttpResponseRedirect
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef, Prefetch, Sum
+from django.http import (Http404, HttpResponse, HttpResponseNotModified,
+                         HttpResponseRedirect)
 from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import mixins, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import (AllowAny, IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
 from rest_framework.response import Response
 
+from recipes.feed import get_feed
 from recipes.models import (Favourite, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingCart, Tag)
+                            ShoppingCart, Tag, actual_count)
+from recipes.search import can_filter_by_rank
 from users.models import Subscription
 
-from .filters import IngredientFilter, RecipeFilter
+from .autocomplete import ingredient_index
+from .cache import (get_catalog, get_recipe_detail, get_recipe_list,
+                    recipe_detail_key, set_recipe_detail)
+from .filters import IngredientFilter, RecipeFilter, RecipeOrderingFilter
+from .images import delete_variants
+from .matching import recipe_match_index
+from .metrics import metrics
+from .pagination import FeedCursorPagination, RecipeCursorPagination
 from .permissions import IsAuthorOrReadOnly
-from .serializers import (AvatarSerializer, IngredientSerializer,
-                          RecipeReadSerializer, RecipeShortSerializer,
-                          RecipeWriteSerializer, TagSerializer,
-                          UserCreateSerializer, UserSerializer,
-                          UserWithRecipesSerializer)
-from .utils import create_shopping_list_response, to_base36
+from .renderers import SHOPPING_LIST_RENDERERS
+from .serializers import (AvatarSerializer, IngredientIdsSerializer,
+                          IngredientSerializer, RecipeIdsSerializer,
+                          RecipeMatchSerializer, RecipeReadSerializer,
+                          RecipeShortSerializer, RecipeWriteSerializer,
+                          TagSerializer, UserCreateSerializer,
+                          UserSerializer, UserWithRecipesSerializer)
+from .shortlinks import recipe_id_bitmap
+from .utils import (create_shopping_list_response, get_recipes_limit,
+                    to_base36, with_recipes)
 
 
 User = get_user_model()
 
+RELATED_COUNTERS = {
+    Favourite: 'favorites_count',
+    ShoppingCart: 'in_carts_count',
+}
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+
+class CatalogCacheMixin:
+    """Отдает полный список каталога из кэша с поддержкой ETag."""
+    catalog_name = None
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params or request.accepted_renderer.format != 'json':
+            return super().list(request, *args, **kwargs)
+        body, etag = get_catalog(
+            self.catalog_name,
+            lambda: self.get_serializer(self.get_queryset(), many=True).data
+        )
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(body, content_type='application/json')
+        response['ETag'] = etag
+        patch_cache_control(response, no_cache=True)
+        return response
+
+
+class TagViewSet(CatalogCacheMixin, viewsets.ReadOnlyModelViewSet):
+    catalog_name = 'tags'
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (AllowAny,)
     pagination_class = None
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(CatalogCacheMixin, viewsets.ReadOnlyModelViewSet):
+    catalog_name = 'ingredients'
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (AllowAny,)
     pagination_class = None
     filterset_class = IngredientFilter
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if name:
+            return Response(ingredient_index.search(name))
+        return super().list(request, *args, **kwargs)
+
 
 class RecipeViewSet(viewsets.ModelViewSet):
     queryset = Recipe.objects.select_related('author').prefetch_related(
-        'ingredients',
+        Prefetch(
+            'recipe_ingredients',
+            queryset=RecipeIngredient.objects.select_related('ingredient')
+        ),
         'tags'
     )
     permission_classes = (IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly)
+    filter_backends = (DjangoFilterBackend, RecipeOrderingFilter)
     filterset_class = RecipeFilter
+    ordering_fields = ('pub_date', 'favorites_count', 'in_carts_count')
+    ordering = ('-pub_date', '-id')
+
+    @property
+    def paginator(self):
+        # Поиск на SQLite сортирует по extra(), по нему курсор не строится.
+        if (not hasattr(self, '_paginator') and self.action == 'list'
+                and RecipeCursorPagination.is_requested(self.request)
+                and (can_filter_by_rank()
+                     or not self.request.query_params.get('search'))):
+            self._paginator = RecipeCursorPagination()
+        return super().paginator
+
+    def get_queryset(self):
+        return super().get_queryset().with_user_flags(self.request.user)
 
     def get_serializer_class(self):
         if self.action in ('list', 'retrieve'):
             return RecipeReadSerializer
+        if self.action == 'match':
+            return RecipeMatchSerializer
         return RecipeWriteSerializer
 
+    def list(self, request, *args, **kwargs):
+        if (request.user.is_authenticated
+                or not settings.RECIPE_LIST_CACHE_TIMEOUT):
+            return super().list(request, *args, **kwargs)
+        return get_recipe_list(
+            request, lambda: super(RecipeViewSet, self).list(
+                request, *args, **kwargs
+            )
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        """Карточка рецепта из кэша с флагами текущего пользователя."""
+        try:
+            pk = int(kwargs[self.lookup_field])
+        except ValueError:
+            raise Http404
+        key = recipe_detail_key(request, pk)
+        data = get_recipe_detail(key)
+        if data is None:
+            response = super().retrieve(request, *args, **kwargs)
+            set_recipe_detail(key, response.data)
+            return response
+        flags = self._get_user_flags(pk)
+        if flags is None:
+            raise Http404
+        is_subscribed = flags.pop('is_subscribed')
+        data.update(flags)
+        data['author']['is_subscribed'] = is_subscribed
+        return Response(data)
+
+    def _get_user_flags(self, pk):
+        """Флаги рецепта для пользователя одним запросом."""
+        user = self.request.user
+        if not user.is_authenticated:
+            return {
+                'is_favorited': False,
+                'is_in_shopping_cart': False,
+                'is_subscribed': False,
+            }
+        return Recipe.objects.filter(pk=pk).with_user_flags(user).annotate(
+            is_subscribed=Exists(Subscription.objects.filter(
+                user=user, author=OuterRef('author')
+            ))
+        ).values(
+            'is_favorited', 'is_in_shopping_cart', 'is_subscribed'
+        ).first()
+
+    def _sync_counter(self, model, recipe_ids):
+        """Записывает в счетчик рецептов реальное число строк model.
+
+        Строки могли появиться мимо API (например, в админке), поэтому
+        счетчик не сдвигается на дельту, а пересчитывается.
+        """
+        Recipe.objects.filter(pk__in=recipe_ids).update(
+            **{RELATED_COUNTERS[model]: actual_count(model)}
+        )
+
     def _add_to_related(self, request, recipe, model, error_message):
         """Общий метод для добавления в связанные модели."""
         user = request.user
 
-        if model.objects.filter(user=user, recipe=recipe).exists():
+        try:
+            with transaction.atomic():
+                model.objects.create(user=user, recipe=recipe)
+                self._sync_counter(model, [recipe.pk])
+        except IntegrityError:
             return Response(
                 {'errors': error_message},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        model.objects.create(user=user, recipe=recipe)
-
         return Response(
             RecipeShortSerializer(recipe, context={'request': request}).data,
             status=status.HTTP_201_CREATED
@@ -76,7 +208,12 @@ class RecipeViewSet(viewsets.ModelViewSet):
         """Общий метод для удаления из связанных моделей."""
         user = request.user
 
-        deleted, _ = model.objects.filter(user=user, recipe=recipe).delete()
+        with transaction.atomic():
+            deleted, _ = model.objects.filter(
+                user=user, recipe=recipe
+            ).delete()
+            if deleted:
+                self._sync_counter(model, [recipe.pk])
 
         if not deleted:
             return Response(
@@ -86,6 +223,57 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    def _bulk_related(self, request, model):
+        """Пакетно добавляет или удаляет рецепты в связанной модели."""
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = list(dict.fromkeys(serializer.validated_data['recipes']))
+        user = request.user
+        found = set(
+            Recipe.objects.filter(pk__in=ids).values_list('pk', flat=True)
+        )
+        related = set(model.objects.filter(
+            user=user, recipe_id__in=found
+        ).values_list('recipe_id', flat=True))
+        with transaction.atomic():
+            if request.method == 'POST':
+                changed = found - related
+                model.objects.bulk_create(
+                    [model(user=user, recipe_id=pk) for pk in changed],
+                    ignore_conflicts=True
+                )
+                done, skipped = 'added', 'exists'
+            else:
+                changed = related
+                model.objects.filter(
+                    user=user, recipe_id__in=changed
+                ).delete()
+                done, skipped = 'removed', 'missing'
+            # Параллельный запрос мог записать те же строки, поэтому
+            # счетчик берется из таблицы, а не из прочитанного до записи.
+            self._sync_counter(model, changed)
+        return Response({'results': [
+            {
+                'id': pk,
+                'status': (
+                    'not_found' if pk not in found
+                    else done if pk in changed else skipped
+                )
+            }
+            for pk in ids
+        ]})
+
+    @action(detail=False, methods=['post', 'delete'],
+            url_path='favorite/bulk', permission_classes=[IsAuthenticated])
+    def favorite_bulk(self, request):
+        return self._bulk_related(request, Favourite)
+
+    @action(detail=False, methods=['post', 'delete'],
+            url_path='shopping_cart/bulk',
+            permission_classes=[IsAuthenticated])
+    def shopping_cart_bulk(self, request):
+        return self._bulk_related(request, ShoppingCart)
+
     @action(detail=True, methods=['post'],
             permission_classes=[IsAuthenticated])
     def favorite(self, request, pk=None):
@@ -113,7 +301,8 @@ class RecipeViewSet(viewsets.ModelViewSet):
         )
 
     @action(detail=False, methods=['get'],
-            permission_classes=[IsAuthenticated])
+            permission_classes=[IsAuthenticated],
+            renderer_classes=SHOPPING_LIST_RENDERERS)
     def download_shopping_cart(self, request):
         ingredients = RecipeIngredient.objects.filter(
             recipe__in_shopping_cart__user=request.user
@@ -121,7 +310,35 @@ class RecipeViewSet(viewsets.ModelViewSet):
             'ingredient__name',
             'ingredient__measurement_unit'
         ).annotate(total=Sum('amount')).order_by('ingredient__name')
-        return create_shopping_list_response(ingredients)
+        return create_shopping_list_response(
+            ingredients, request.accepted_renderer
+        )
+
+    @action(detail=False, methods=['get'])
+    def match(self, request):
+        """Рецепты, которые можно приготовить из данных ингредиентов."""
+        ids = [
+            value
+            for param in request.query_params.getlist('ingredients')
+            for value in param.split(',') if value
+        ]
+        serializer = IngredientIdsSerializer(data={'ingredients': ids})
+        serializer.is_valid(raise_exception=True)
+        matches = recipe_match_index.match(
+            serializer.validated_data['ingredients']
+        )
+        page = self.paginate_queryset(matches)
+        coverage = dict(page)
+        recipes = self.get_queryset().in_bulk(coverage)
+        results = []
+        for recipe_id, value in page:
+            recipe = recipes.get(recipe_id)
+            if recipe is not None:
+                recipe.coverage = value
+                results.append(recipe)
+        return self.get_paginated_response(
+            self.get_serializer(results, many=True).data
+        )
 
     @action(detail=True, methods=['get'], url_path='get-link')
     def get_link(self, request, pk=None):
@@ -142,7 +359,8 @@ class UserViewSet(
     lookup_value_regex = r'\d+'
 
     def get_permissions(self):
-        if self.action in ('me', 'avatar', 'subscribe', 'subscriptions'):
+        if self.action in ('me', 'avatar', 'subscribe', 'subscriptions',
+                           'feed'):
             return (IsAuthenticated(),)
         return (AllowAny(),)
 
@@ -186,12 +404,17 @@ class UserViewSet(
             serializer.save()
             return Response(serializer.data)
         if user.avatar:
+            delete_variants(user, 'avatar', 'avatar_variants')
+            user.avatar_variants = {}
             user.avatar.delete(save=True)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=False, methods=['get'], url_path='subscriptions')
     def subscriptions(self, request):
-        authors = User.objects.filter(following__user=request.user)
+        authors = with_recipes(
+            User.objects.filter(following__user=request.user),
+            get_recipes_limit(request)
+        )
         page = self.paginate_queryset(authors)
         serializer = UserWithRecipesSerializer(page or authors,
                                                many=True,
@@ -200,6 +423,30 @@ class UserViewSet(
             return self.get_paginated_response(serializer.data)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'])
+    def feed(self, request):
+        """Новые рецепты авторов, на которых подписан пользователь."""
+        source = get_feed(
+            request.user, UserSerializer.get_subscribed_ids(request)
+        )
+        recipes = RecipeViewSet.queryset.with_user_flags(request.user)
+        if source.model is Recipe:
+            paginator = RecipeCursorPagination()
+            page = paginator.paginate_queryset(
+                recipes.filter(pk__in=source.values('pk')), request, self
+            )
+        else:
+            paginator = FeedCursorPagination()
+            items = paginator.paginate_queryset(source, request, self)
+            found = recipes.in_bulk([item.recipe_id for item in items])
+            page = [
+                found[item.recipe_id]
+                for item in items if item.recipe_id in found
+            ]
+        return paginator.get_paginated_response(RecipeReadSerializer(
+            page, many=True, context={'request': request}
+        ).data)
+
     @action(detail=True, methods=['post', 'delete'], url_path='subscribe')
     def subscribe(self, request, pk=None):
         author = get_object_or_404(User, id=pk)
@@ -210,41 +457,52 @@ class UserViewSet(
                     {'errors': 'Нельзя подписаться на самого себя.'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            if Subscription.objects.filter(user=user, author=author).exists():
+            try:
+                with transaction.atomic():
+                    Subscription.objects.create(user=user, author=author)
+            except IntegrityError:
                 return Response(
                     {'errors': 'Вы уже подписаны на этого пользователя.'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            Subscription.objects.create(user=user, author=author)
+            author = with_recipes(
+                User.objects.filter(pk=author.pk), get_recipes_limit(request)
+            ).get()
             serializer = UserWithRecipesSerializer(
                 author,
                 context={'request': request}
             )
             return Response(serializer.data, status=status.HTTP_201_CREATED)
-        subscription = Subscription.objects.filter(
+        deleted, _ = Subscription.objects.filter(
             user=user,
-            author=author).first()
-        if not subscription:
+            author=author).delete()
+        if not deleted:
             return Response(
                 {'errors': 'Вы не подписаны на этого пользователя.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        subscription.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+def metrics_view(request):
+    return HttpResponse(
+        metrics.render(), content_type='text/plain; version=0.0.4'
+    )
+
+
 def short_link_redirect(request, code):
     recipe_id = _from_base36(code)
     if recipe_id is None:
         return HttpResponse(status=HTTPStatus.NOT_FOUND)
-    recipe = Recipe.objects.filter(id=recipe_id).first()
-    if not recipe:
+    if recipe_id not in recipe_id_bitmap:
         return HttpResponse(status=HTTPStatus.NOT_FOUND)
-    return HttpResponseRedirect(f'/recipes/{recipe.id}')
+    return HttpResponseRedirect(f'/recipes/{recipe_id}')
 
 
 def _from_base36(value):
     try:
-        return int(value, 36)
+        number = int(value, 36)
     except ValueError:
         return None
+    # Id рецепта - BigAutoField, большие числа в запрос не передаем.
+    return number if 0 < number < 2 ** 63 else None
@@ -34,6 +34,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.QueryInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -78,6 +79,22 @@ DATABASES = {
     }
 }
 
+# Версии наборов данных в кэше общие для воркеров и management-команд,
+# поэтому кэш по умолчанию файловый, а не в памяти процесса.
+CACHE_BACKEND = env.str(
+    'CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'
+)
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': env.str('CACHE_LOCATION', str(BASE_DIR / 'cache')),
+    }
+}
+if CACHE_BACKEND.endswith(('FileBasedCache', 'LocMemCache')):
+    CACHES['default']['OPTIONS'] = {
+        'MAX_ENTRIES': env.int('CACHE_MAX_ENTRIES', 10000)
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -137,8 +154,19 @@ DJOSER = {
     },
 }
 
+# Кэш списка рецептов для анонимных пользователей, секунды (0 - выключен).
+RECIPE_LIST_CACHE_TIMEOUT = env.int('RECIPE_LIST_CACHE_TIMEOUT', 60)
+# Сколько еще отдавать устаревший список, пока один запрос его пересобирает.
+RECIPE_LIST_CACHE_STALE = env.int('RECIPE_LIST_CACHE_STALE', 30)
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+MAX_IMAGE_SIZE = env.int('MAX_IMAGE_SIZE', 10 * 1024 * 1024)
+ALLOWED_IMAGE_TYPES = env.list(
+    'ALLOWED_IMAGE_TYPES',
+    default=['image/jpeg', 'image/png', 'image/gif', 'image/webp']
+)
+
 STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'static'
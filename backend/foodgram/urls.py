@@ -3,12 +3,13 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
-from api.views import short_link_redirect
+from api.views import metrics_view, short_link_redirect
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
     path('s/<slug:code>/', short_link_redirect),
+    path('metrics', metrics_view),
 ]
 if settings.DEBUG:
     urlpatterns += static(
@@ -18,7 +18,7 @@ class RecipeAdmin(admin.ModelAdmin):
     search_fields = ('name', 'author__username')
     inlines = [RecipeIngredientInline]
     filter_horizontal = ('tags',)
-    readonly_fields = ('favorites_count',)
+    readonly_fields = ('favorites_count', 'in_carts_count')
 
     def cooking_time_min(self, obj):
         return f'{obj.cooking_time} мин'
@@ -26,9 +26,6 @@ class RecipeAdmin(admin.ModelAdmin):
     def show_tags(self, obj):
         return ', '.join([tag.name for tag in obj.tags.all()])
 
-    def favorites_count(self, obj):
-        return obj.in_favorites.count()
-
 
 @admin.register(Ingredient)
 class IngredientAdmin(admin.ModelAdmin):
@@ -6,3 +6,16 @@ MAX_COOKING_TIME = 1000
 
 MIN_INGREDIENT_AMOUNT = 1
 MAX_INGREDIENT_AMOUNT = 1000
+
+IMPORT_BATCH_SIZE = 1000
+IMPORT_READ_SIZE = 64 * 1024
+
+SEARCH_CONFIG = 'russian'
+SQLITE_MAX_VARIABLES = 900
+
+FEED_FANOUT_LIMIT = 10000
+FEED_BACKFILL_SIZE = 50
+FEED_BATCH_SIZE = 1000
+FEED_HEAVY_AUTHORS_TIMEOUT = 10 * 60
+
+SEED_USERNAME_PREFIX = 'seed'
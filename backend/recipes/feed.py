@@ -0,0 +1,87 @@
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from users.models import Subscription
+
+from .constants import (FEED_BACKFILL_SIZE, FEED_BATCH_SIZE,
+                        FEED_FANOUT_LIMIT, FEED_HEAVY_AUTHORS_TIMEOUT)
+from .models import FeedItem, Recipe
+
+
+HEAVY_AUTHORS_KEY = 'feed:heavy_authors'
+
+
+def heavy_author_ids():
+    """Авторы, у которых больше FEED_FANOUT_LIMIT подписчиков.
+
+    Их рецепты не раскладываются по лентам при публикации, а
+    подмешиваются в ленту при чтении.
+    """
+    return cache.get_or_set(
+        HEAVY_AUTHORS_KEY,
+        lambda: set(
+            Subscription.objects.values('author').annotate(
+                followers=Count('pk')
+            ).filter(
+                followers__gt=FEED_FANOUT_LIMIT
+            ).values_list('author', flat=True)
+        ),
+        timeout=FEED_HEAVY_AUTHORS_TIMEOUT
+    )
+
+
+def fan_out(recipe):
+    """Добавляет новый рецепт в ленты всех подписчиков автора."""
+    if recipe.author_id in heavy_author_ids():
+        return
+    followers = Subscription.objects.filter(
+        author_id=recipe.author_id
+    ).values_list('user_id', flat=True)
+    FeedItem.objects.bulk_create(
+        (
+            FeedItem(user_id=user_id, recipe=recipe, pub_date=recipe.pub_date)
+            for user_id in followers.iterator()
+        ),
+        batch_size=FEED_BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту последние рецепты автора после подписки."""
+    if author_id in heavy_author_ids():
+        return
+    recipes = Recipe.objects.filter(author_id=author_id).values_list(
+        'pk', 'pub_date'
+    )[:FEED_BACKFILL_SIZE]
+    FeedItem.objects.bulk_create(
+        [
+            FeedItem(user_id=user_id, recipe_id=pk, pub_date=pub_date)
+            for pk, pub_date in recipes
+        ],
+        ignore_conflicts=True
+    )
+
+
+def remove_author(user_id, author_id):
+    """Убирает рецепты автора из ленты после отписки."""
+    FeedItem.objects.filter(
+        user_id=user_id, recipe__author_id=author_id
+    ).delete()
+
+
+def get_feed(user, followed_ids):
+    """Возвращает источник ленты пользователя.
+
+    Если пользователь не подписан на авторов с огромным числом
+    подписчиков, лента - это диапазон записей FeedItem по индексу
+    (user, -pub_date). Иначе к ней подмешиваются рецепты таких авторов,
+    и возвращается queryset рецептов.
+    """
+    heavy = heavy_author_ids() & set(followed_ids)
+    if not heavy:
+        return FeedItem.objects.filter(user=user)
+    return Recipe.objects.filter(
+        Q(pk__in=FeedItem.objects.filter(user=user).values('recipe'))
+        | Q(author__in=heavy)
+    )
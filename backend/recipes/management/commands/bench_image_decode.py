@@ -0,0 +1,65 @@
+import base64
+import math
+import os
+import time
+import tracemalloc
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+from PIL import Image
+from rest_framework import serializers
+
+from api.fields import Base64ImageField
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пиковую память и время разбора картинки в data URI: '
+        'декодирование целиком и Base64ImageField.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size-mb', type=float, default=8,
+                            help='Размер data URI в мегабайтах')
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        data = self.make_data_uri(int(options['size_mb'] * 1024 * 1024))
+        self.stdout.write(
+            f'data URI {len(data) / 1024 / 1024:.1f} МБ, '
+            f'PNG {len(data) * 3 / 4 / 1024 / 1024:.1f} МБ'
+        )
+        for name, decode in (
+            ('целиком', self.decode_whole),
+            ('Base64ImageField', Base64ImageField().to_internal_value),
+        ):
+            peaks = []
+            timings = []
+            for _ in range(options['repeat']):
+                tracemalloc.start()
+                started = time.perf_counter()
+                decode(data).close()
+                timings.append(time.perf_counter() - started)
+                peaks.append(tracemalloc.get_traced_memory()[1])
+                tracemalloc.stop()
+            self.stdout.write(
+                f'{name:<18} пик памяти {max(peaks) / 1024 / 1024:>6.1f} МБ  '
+                f'время {min(timings) * 1000:>7.1f} мс'
+            )
+
+    def make_data_uri(self, size):
+        # Шум почти не сжимается: PNG весит около 3 байт на пиксель.
+        side = math.isqrt(size * 3 // 4 // 3)
+        image = Image.frombytes('RGB', (side, side), os.urandom(side ** 2 * 3))
+        buffer = BytesIO()
+        image.save(buffer, 'PNG', compress_level=1)
+        return 'data:image/png;base64,' + base64.b64encode(
+            buffer.getvalue()
+        ).decode()
+
+    def decode_whole(self, data):
+        """Прежний разбор: split() и b64decode() всей строки в память."""
+        _, content = data.split(';base64,')
+        file = ContentFile(base64.b64decode(content), name='image.png')
+        return serializers.ImageField().to_internal_value(file)
@@ -1,26 +1,113 @@
 import csv
+import json
+import time
+from itertools import islice
 from pathlib import Path
 
 from django.conf import settings
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
+from api.cache import bump_version
+from recipes.constants import IMPORT_BATCH_SIZE, IMPORT_READ_SIZE
 from recipes.models import Ingredient
 
 
+def read_csv(file):
+    for row in csv.reader(file):
+        if len(row) < 2:
+            continue
+        yield row[0], row[1]
+
+
+def read_json(file):
+    """Потоково читает JSON-массив объектов, не загружая файл целиком."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    started = False
+    while True:
+        chunk = file.read(IMPORT_READ_SIZE)
+        buffer += chunk
+        while True:
+            buffer = buffer.lstrip()
+            if not started:
+                if not buffer:
+                    break
+                if buffer[0] != '[':
+                    raise CommandError('Ожидался JSON-массив')
+                started = True
+                buffer = buffer[1:]
+                continue
+            buffer = buffer.lstrip(',').lstrip()
+            if not buffer or buffer[0] == ']':
+                break
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if not chunk:
+                    raise CommandError('Некорректный JSON')
+                break
+            buffer = buffer[end:]
+            yield item['name'], item['measurement_unit']
+        if not chunk:
+            return
+
+
+READERS = {
+    'csv': read_csv,
+    'json': read_json,
+}
+
+
 class Command(BaseCommand):
+    help = 'Загружает ингредиенты из CSV или JSON файла пачками.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            type=Path,
+            default=Path(settings.BASE_DIR) / 'data' / 'ingredients.csv',
+            help='Путь к файлу с ингредиентами'
+        )
+        parser.add_argument(
+            '--format',
+            choices=READERS,
+            help='Формат файла (по умолчанию определяется по расширению)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=IMPORT_BATCH_SIZE,
+            help='Количество строк в одном INSERT'
+        )
+
     def handle(self, *args, **options):
-        path = Path(settings.BASE_DIR) / 'data' / 'ingredients.csv'
+        path = options['path']
         if not path.exists():
             self.stdout.write(self.style.ERROR('Файл ингредиентов не найден'))
             return
-        with path.open(encoding='utf-8') as csvfile:
-            reader = csv.reader(csvfile)
-            for row in reader:
-                if not row:
-                    continue
-                name, measurement_unit = row[0], row[1]
-                Ingredient.objects.get_or_create(
-                    name=name,
-                    measurement_unit=measurement_unit
-                )
-        self.stdout.write(self.style.SUCCESS('Ингредиенты загружены'))
+        file_format = options['format'] or path.suffix.lstrip('.').lower()
+        if file_format not in READERS:
+            raise CommandError(f'Неизвестный формат файла: {file_format}')
+        batch_size = options['batch_size']
+        started = time.perf_counter()
+        count_before = Ingredient.objects.count()
+        total = 0
+        with path.open(encoding='utf-8') as file:
+            rows = READERS[file_format](file)
+            while True:
+                batch = [
+                    Ingredient(name=name, measurement_unit=measurement_unit)
+                    for name, measurement_unit in islice(rows, batch_size)
+                ]
+                if not batch:
+                    break
+                # Дубликаты отсекает ограничение unique_name_ingredient.
+                Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+                total += len(batch)
+        # bulk_create не отправляет сигналы, сбрасываем кэш каталога явно.
+        bump_version('ingredients')
+        created = Ingredient.objects.count() - count_before
+        self.stdout.write(self.style.SUCCESS(
+            f'Ингредиенты загружены: прочитано {total}, добавлено {created}, '
+            f'время {time.perf_counter() - started:.2f} с'
+        ))
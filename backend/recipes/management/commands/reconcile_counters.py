@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+
+from recipes.models import Favourite, Recipe, ShoppingCart, actual_count
+
+
+COUNTERS = {
+    'favorites_count': Favourite,
+    'in_carts_count': ShoppingCart,
+}
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики избранного и списков покупок рецептов.'
+
+    def handle(self, *args, **options):
+        actual = {
+            f'actual_{field}': actual_count(model)
+            for field, model in COUNTERS.items()
+        }
+        drift = Q()
+        for field in COUNTERS:
+            drift |= ~Q(**{field: F(f'actual_{field}')})
+        ids = list(Recipe.objects.annotate(**actual).filter(
+            drift
+        ).values_list('pk', flat=True))
+        if ids:
+            Recipe.objects.filter(pk__in=ids).update(**{
+                field: actual_count(model)
+                for field, model in COUNTERS.items()
+            })
+        self.stdout.write(self.style.SUCCESS(
+            f'Счетчики исправлены у рецептов: {len(ids)}'
+        ))
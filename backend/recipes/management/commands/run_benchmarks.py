@@ -0,0 +1,221 @@
+import json
+import random
+import statistics
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.utils import to_base36
+from recipes.constants import SEED_USERNAME_PREFIX
+from recipes.models import Ingredient, Recipe, RecipeIngredient
+from users.models import User
+
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE')
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    index = min(len(values) - 1, round(percent / 100 * (len(values) - 1)))
+    return values[index]
+
+
+class Command(BaseCommand):
+    help = (
+        'Прогоняет основные запросы API и сохраняет p50/p99 задержки '
+        'и число SQL-запросов в JSON-отчет.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--output', type=Path,
+                            default=Path('bench_report.json'))
+        parser.add_argument('--compare', type=Path,
+                            help='Отчет предыдущего прогона для сравнения')
+        parser.add_argument('--host', default='localhost')
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        # Замеры идут только от имени пользователей seed_data, чтобы не
+        # трогать настоящие аккаунты.
+        user = User.objects.filter(
+            username__startswith=SEED_USERNAME_PREFIX,
+            follower__isnull=False
+        ).first()
+        recipe_ids = list(Recipe.objects.values_list('pk', flat=True))
+        if user is None or not recipe_ids:
+            raise CommandError(
+                'Нет данных для замеров, запустите сначала seed_data'
+            )
+        rng = random.Random(options['seed'])
+        names = list(Ingredient.objects.values_list('name', flat=True)[:500])
+        words = [
+            word
+            for name in Recipe.objects.values_list('name', flat=True)[:500]
+            for word in name.split()[:1]
+        ]
+        anonymous = APIClient(HTTP_HOST=options['host'])
+        client = APIClient(HTTP_HOST=options['host'])
+        client.force_authenticate(user)
+        source = Recipe.objects.filter(author=user).first()
+        scenarios = {
+            'recipes_list_anonymous': (anonymous, lambda: (
+                f'/api/recipes/?page={rng.randint(1, 5)}'
+            )),
+            'recipes_list': (client, lambda: (
+                f'/api/recipes/?page={rng.randint(1, 5)}'
+            )),
+            'recipes_list_cursor': (client, lambda: (
+                '/api/recipes/?pagination=cursor'
+            )),
+            'recipe_retrieve': (client, lambda: (
+                f'/api/recipes/{rng.choice(recipe_ids)}/'
+            )),
+            # Поиск идет от пользователя: анонимный список кэшируется.
+            'search': (client, lambda: (
+                f'/api/recipes/?search={rng.choice(words)}'
+            )),
+            'ingredient_search': (anonymous, lambda: (
+                f'/api/ingredients/?name={rng.choice(names)[:3]}'
+            )),
+            'subscriptions': (client, lambda: (
+                '/api/users/subscriptions/?recipes_limit=3'
+            )),
+            'feed': (client, lambda: '/api/users/feed/'),
+            'download_shopping_cart': (client, lambda: (
+                '/api/recipes/download_shopping_cart/'
+            )),
+            'short_link': (anonymous, lambda: (
+                f'/s/{to_base36(rng.choice(recipe_ids))}/'
+            )),
+        }
+        # PATCH правит временную копию рецепта, которая удаляется после
+        # замеров, а не рецепт из данных seed_data.
+        scratch = None
+        if source is not None:
+            scratch = self.create_scratch_recipe(source)
+            scenarios['recipe_update'] = (client, lambda: (
+                f'/api/recipes/{scratch.pk}/'
+            ), self.make_update_payload(scratch, rng))
+        try:
+            results = self.run_scenarios(scenarios, options['iterations'])
+        finally:
+            if scratch is not None:
+                scratch.delete()
+        report = {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'iterations': options['iterations'],
+            'recipes': len(recipe_ids),
+            'results': results,
+        }
+        options['output'].write_text(
+            json.dumps(report, indent=2, ensure_ascii=False), encoding='utf-8'
+        )
+        previous = {}
+        if options['compare']:
+            previous = json.loads(
+                options['compare'].read_text(encoding='utf-8')
+            )['results']
+        for name, values in results.items():
+            line = (
+                f'{name:<26} p50 {values["p50_ms"]:>8.2f} ms  '
+                f'p99 {values["p99_ms"]:>8.2f} ms  '
+                f'queries {values["queries"]:>3}  '
+                f'writes {values["writes"]:>3}'
+            )
+            if name in previous:
+                old = previous[name]
+                line += (
+                    f'  (было p50 {old["p50_ms"]:.2f} ms, '
+                    f'queries {old["queries"]}, '
+                    f'writes {old.get("writes", 0)})'
+                )
+            self.stdout.write(line)
+        self.stdout.write(self.style.SUCCESS(
+            f'Отчет сохранен в {options["output"]}'
+        ))
+
+    def run_scenarios(self, scenarios, iterations):
+        results = {}
+        for name, (http, make_url, *payload) in scenarios.items():
+            request = self.make_request(http, payload)
+            request(make_url())
+            timings = []
+            queries = []
+            writes = []
+            for _ in range(iterations):
+                url = make_url()
+                with CaptureQueriesContext(connection) as context:
+                    started = time.perf_counter()
+                    response = request(url)
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                    timings.append((time.perf_counter() - started) * 1000)
+                if response.status_code >= 400:
+                    raise CommandError(
+                        f'{name}: {url} вернул {response.status_code}'
+                    )
+                queries.append(len(context.captured_queries))
+                writes.append(sum(
+                    query['sql'].lstrip().startswith(WRITE_STATEMENTS)
+                    for query in context.captured_queries
+                ))
+            results[name] = {
+                'p50_ms': round(percentile(timings, 50), 2),
+                'p99_ms': round(percentile(timings, 99), 2),
+                'mean_ms': round(statistics.mean(timings), 2),
+                'queries': max(queries),
+                'writes': max(writes),
+            }
+        return results
+
+    def make_request(self, http, payload):
+        if not payload:
+            return http.get
+        make_body = payload[0]
+        return lambda url: http.patch(
+            url, json.dumps(make_body()), content_type='application/json'
+        )
+
+    def create_scratch_recipe(self, source):
+        """Копия рецепта с теми же тегами и ингредиентами для замеров PATCH."""
+        recipe = Recipe.objects.create(
+            author=source.author,
+            name=source.name,
+            text=source.text,
+            image=source.image.name,
+            cooking_time=source.cooking_time
+        )
+        recipe.tags.set(source.tags.all())
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe,
+                ingredient_id=ingredient_id,
+                amount=amount
+            )
+            for ingredient_id, amount in source.recipe_ingredients.values_list(
+                'ingredient_id', 'amount'
+            )
+        )
+        return recipe
+
+    def make_update_payload(self, recipe, rng):
+        """Правка рецепта: меняется время и количество одного ингредиента."""
+        tags = list(recipe.tags.values_list('pk', flat=True))
+        ingredients = [
+            {'id': ingredient_id, 'amount': amount}
+            for ingredient_id, amount in recipe.recipe_ingredients.values_list(
+                'ingredient_id', 'amount'
+            )
+        ]
+
+        def make_body():
+            body = {'cooking_time': rng.randint(1, 120)}
+            if tags and ingredients:
+                rng.choice(ingredients)['amount'] = rng.randint(1, 500)
+                body.update(tags=tags, ingredients=ingredients)
+            return body
+        return make_body
@@ -0,0 +1,186 @@
+import random
+import time
+from io import BytesIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+from api.cache import bump_version
+from recipes.constants import IMPORT_BATCH_SIZE, SEED_USERNAME_PREFIX
+from recipes.feed import backfill
+from recipes.models import (Favourite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from recipes.search import update_search_index
+from users.models import Subscription
+
+
+User = get_user_model()
+
+SEED_IMAGE = 'recipes/images/seed.jpg'
+SEED_TAGS = (('Завтрак', 'breakfast'), ('Обед', 'lunch'), ('Ужин', 'dinner'))
+WORDS = (
+    'быстрый', 'домашний', 'летний', 'острый', 'сытный', 'легкий',
+    'салат', 'суп', 'пирог', 'рагу', 'омлет', 'паста', 'каша', 'запеканка'
+)
+
+
+class Command(BaseCommand):
+    help = 'Заполняет базу синтетическими данными для нагрузочных тестов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--subscriptions', type=int, default=10,
+                            help='Подписок на пользователя')
+        parser.add_argument('--favorites', type=int, default=20,
+                            help='Рецептов в избранном у пользователя')
+        parser.add_argument('--cart', type=int, default=10,
+                            help='Рецептов в списке покупок у пользователя')
+        parser.add_argument('--min-ingredients', type=int, default=5)
+        parser.add_argument('--max-ingredients', type=int, default=30)
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        rng = random.Random(options['seed'])
+        ingredient_ids = self.get_ingredient_ids(options['max_ingredients'])
+        tags = [
+            Tag.objects.get_or_create(slug=slug, defaults={'name': name})[0]
+            for name, slug in SEED_TAGS
+        ]
+        if not default_storage.exists(SEED_IMAGE):
+            buffer = BytesIO()
+            Image.new('RGB', (600, 400), (230, 160, 60)).save(buffer, 'JPEG')
+            default_storage.save(SEED_IMAGE, ContentFile(buffer.getvalue()))
+
+        users = self.create_users(options['users'])
+        user_ids = [user.pk for user in users]
+        recipes = Recipe.objects.bulk_create(
+            (
+                Recipe(
+                    author_id=rng.choice(user_ids),
+                    name=f'{rng.choice(WORDS)} {rng.choice(WORDS)}',
+                    text=' '.join(rng.choices(WORDS, k=30)),
+                    image=SEED_IMAGE,
+                    cooking_time=rng.randint(5, 180)
+                )
+                for _ in range(options['recipes'])
+            ),
+            batch_size=IMPORT_BATCH_SIZE
+        )
+        recipe_ids = list(Recipe.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        )[:len(recipes)])
+        self.create_recipe_relations(rng, recipe_ids, ingredient_ids, tags,
+                                     options)
+        self.create_user_relations(rng, user_ids, recipe_ids, options)
+
+        call_command('reconcile_counters', stdout=self.stdout)
+        update_search_index(recipe_ids)
+        bump_version('recipe_ingredients')
+        bump_version('recipe_list')
+        bump_version('recipe_ids')
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано пользователей: {len(users)}, рецептов: '
+            f'{len(recipe_ids)}, время {time.perf_counter() - started:.1f} с'
+        ))
+
+    def get_ingredient_ids(self, required):
+        if Ingredient.objects.count() < required:
+            call_command('load_ingredients', stdout=self.stdout)
+        missing = required - Ingredient.objects.count()
+        if missing > 0:
+            Ingredient.objects.bulk_create(
+                [
+                    Ingredient(name=f'ингредиент {index}',
+                               measurement_unit='г')
+                    for index in range(missing)
+                ],
+                ignore_conflicts=True
+            )
+        return list(Ingredient.objects.values_list('pk', flat=True))
+
+    def create_users(self, count):
+        offset = User.objects.count()
+        password = make_password('seed-password')
+        User.objects.bulk_create(
+            (
+                User(
+                    username=f'{SEED_USERNAME_PREFIX}{offset + index}',
+                    email=(
+                        f'{SEED_USERNAME_PREFIX}{offset + index}@example.com'
+                    ),
+                    first_name='Тест',
+                    last_name=f'Пользователь {offset + index}',
+                    password=password
+                )
+                for index in range(count)
+            ),
+            batch_size=IMPORT_BATCH_SIZE
+        )
+        return list(User.objects.filter(
+            username__startswith=SEED_USERNAME_PREFIX
+        ).order_by('-pk')[:count])
+
+    def create_recipe_relations(self, rng, recipe_ids, ingredient_ids, tags,
+                                options):
+        RecipeIngredient.objects.bulk_create(
+            (
+                RecipeIngredient(
+                    recipe_id=recipe_id,
+                    ingredient_id=ingredient_id,
+                    amount=rng.randint(1, 500)
+                )
+                for recipe_id in recipe_ids
+                for ingredient_id in rng.sample(
+                    ingredient_ids,
+                    rng.randint(options['min_ingredients'],
+                                options['max_ingredients'])
+                )
+            ),
+            batch_size=IMPORT_BATCH_SIZE
+        )
+        Recipe.tags.through.objects.bulk_create(
+            (
+                Recipe.tags.through(recipe_id=recipe_id, tag_id=tag.pk)
+                for recipe_id in recipe_ids
+                for tag in rng.sample(tags, rng.randint(1, len(tags)))
+            ),
+            batch_size=IMPORT_BATCH_SIZE
+        )
+
+    def create_user_relations(self, rng, user_ids, recipe_ids, options):
+        pairs = {
+            (user_id, author_id)
+            for user_id in user_ids
+            for author_id in rng.sample(
+                user_ids, min(options['subscriptions'], len(user_ids))
+            )
+            if author_id != user_id
+        }
+        Subscription.objects.bulk_create(
+            (Subscription(user_id=user, author_id=author)
+             for user, author in pairs),
+            batch_size=IMPORT_BATCH_SIZE,
+            ignore_conflicts=True
+        )
+        for user_id, author_id in pairs:
+            backfill(user_id, author_id)
+        for model, count in ((Favourite, options['favorites']),
+                             (ShoppingCart, options['cart'])):
+            model.objects.bulk_create(
+                (
+                    model(user_id=user_id, recipe_id=recipe_id)
+                    for user_id in user_ids
+                    for recipe_id in rng.sample(
+                        recipe_ids, min(count, len(recipe_ids))
+                    )
+                ),
+                batch_size=IMPORT_BATCH_SIZE,
+                ignore_conflicts=True
+            )
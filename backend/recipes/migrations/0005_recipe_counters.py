@@ -0,0 +1,38 @@
+# Generated by Django 3.2.3 on 2026-10-17 04:42
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    for field, related in (('favorites_count', 'Favourite'),
+                           ('in_carts_count', 'ShoppingCart')):
+        model = apps.get_model('recipes', related)
+        Recipe.objects.update(**{field: Coalesce(Subquery(
+            model.objects.filter(recipe=OuterRef('pk')).values(
+                'recipe'
+            ).annotate(total=Count('pk')).values('total')
+        ), 0)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_recipe_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В списках покупок'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
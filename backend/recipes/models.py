@@ -1,6 +1,8 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.db.models.functions import Coalesce
 
 from .constants import (MAX_COOKING_TIME, MAX_INGREDIENT_AMOUNT,
                         MAX_LENGTH_LONG, MAX_LENGTH_SHORT, MIN_COOKING_TIME,
@@ -56,6 +58,45 @@ class Ingredient(models.Model):
         return f'{self.name}, {self.measurement_unit}'
 
 
+def actual_count(model):
+    """Подзапрос с реальным числом строк model у рецепта."""
+    return Coalesce(models.Subquery(
+        model.objects.filter(recipe=models.OuterRef('pk')).values(
+            'recipe'
+        ).annotate(total=models.Count('pk')).values('total')
+    ), 0)
+
+
+class RecipeQuerySet(models.QuerySet):
+
+    def with_user_flags(self, user):
+        """Аннотирует рецепты флагами избранного и списка покупок."""
+        if not user.is_authenticated:
+            return self.annotate(
+                is_favorited=models.Value(
+                    False, output_field=models.BooleanField()
+                ),
+                is_in_shopping_cart=models.Value(
+                    False, output_field=models.BooleanField()
+                )
+            )
+        return self.annotate(
+            is_favorited=models.Exists(Favourite.objects.filter(
+                user=user, recipe=models.OuterRef('pk')
+            )),
+            is_in_shopping_cart=models.Exists(ShoppingCart.objects.filter(
+                user=user, recipe=models.OuterRef('pk')
+            ))
+        )
+
+
+class RecipeManager(models.Manager.from_queryset(RecipeQuerySet)):
+
+    def get_queryset(self):
+        # Поисковый вектор нужен только в WHERE, в SELECT он лишний.
+        return super().get_queryset().defer('search_vector')
+
+
 class Recipe(models.Model):
     """Модель рецепта"""
     author = models.ForeignKey(
@@ -72,6 +113,12 @@ class Recipe(models.Model):
         'Картинка рецепта',
         upload_to='recipes/images/'
     )
+    image_variants = models.JSONField(
+        'Варианты картинки',
+        default=dict,
+        blank=True,
+        editable=False
+    )
     text = models.TextField(
         'Описание рецепта'
     )
@@ -105,11 +152,38 @@ class Recipe(models.Model):
         'Дата публикации',
         auto_now_add=True
     )
+    favorites_count = models.PositiveIntegerField(
+        'В избранном',
+        default=0,
+        editable=False
+    )
+    in_carts_count = models.PositiveIntegerField(
+        'В списках покупок',
+        default=0,
+        editable=False
+    )
+    search_vector = SearchVectorField(
+        'Поисковый вектор',
+        null=True,
+        editable=False
+    )
+
+    objects = RecipeManager()
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='recipe_pub_date_idx'
+            ),
+            models.Index(
+                fields=('author', '-pub_date'),
+                name='recipe_author_pub_date_idx'
+            )
+        ]
 
     def __str__(self):
         return self.name
@@ -205,3 +279,36 @@ class ShoppingCart(models.Model):
                 name='unique_shopping_cart'
             )
         ]
+
+
+class FeedItem(models.Model):
+    """Рецепт в персональной ленте подписчика"""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='Подписчик'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='Рецепт'
+    )
+    pub_date = models.DateTimeField('Дата публикации рецепта')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Ленты подписок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_feed_item'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=('user', '-pub_date', '-recipe'),
+                name='feed_user_pub_date_idx'
+            )
+        ]
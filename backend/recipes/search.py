@@ -0,0 +1,111 @@
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connection
+from django.db.models import F, OuterRef, Subquery
+
+from .constants import SEARCH_CONFIG, SQLITE_MAX_VARIABLES
+from .models import Recipe, RecipeIngredient
+
+
+FTS_TABLE = 'recipes_recipe_fts'
+
+
+def update_search_index(recipe_ids):
+    """Пересчитывает поисковый индекс для указанных рецептов.
+
+    На PostgreSQL обновляется колонка search_vector (GIN-индекс),
+    на SQLite - виртуальная таблица FTS5.
+    """
+    recipe_ids = list(recipe_ids)
+    if connection.vendor == 'postgresql':
+        ingredients = Subquery(
+            RecipeIngredient.objects.filter(
+                recipe=OuterRef('pk')
+            ).values('recipe').annotate(
+                names=StringAgg('ingredient__name', ' ')
+            ).values('names')
+        )
+        Recipe.objects.filter(pk__in=recipe_ids).update(search_vector=(
+            SearchVector('name', weight='A', config=SEARCH_CONFIG)
+            + SearchVector(ingredients, weight='B', config=SEARCH_CONFIG)
+            + SearchVector('text', weight='C', config=SEARCH_CONFIG)
+        ))
+    elif connection.vendor == 'sqlite':
+        for start in range(0, len(recipe_ids), SQLITE_MAX_VARIABLES):
+            _update_fts(recipe_ids[start:start + SQLITE_MAX_VARIABLES])
+
+
+def _update_fts(recipe_ids):
+    placeholders = ', '.join(['%s'] * len(recipe_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})',
+            recipe_ids
+        )
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, name, text, ingredients) '
+            f'SELECT r.id, r.name, r.text, ('
+            f'  SELECT group_concat(i.name, \' \') '
+            f'  FROM recipes_recipeingredient ri '
+            f'  JOIN recipes_ingredient i ON i.id = ri.ingredient_id '
+            f'  WHERE ri.recipe_id = r.id'
+            f') FROM recipes_recipe r WHERE r.id IN ({placeholders})',
+            recipe_ids
+        )
+
+
+def remove_from_search_index(recipe_id):
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [recipe_id]
+            )
+
+
+def _fts_query(query):
+    """Экранирует слова запроса для MATCH и ищет их по префиксу."""
+    words = query.split()
+    return ' '.join('"{}"*'.format(word.replace('"', '""')) for word in words)
+
+
+def search_recipes(queryset, query):
+    """Фильтрует рецепты по запросу и аннотирует релевантность search_rank.
+
+    Чем больше search_rank, тем выше рецепт в выдаче.
+    """
+    if connection.vendor == 'postgresql':
+        search_query = SearchQuery(
+            query, config=SEARCH_CONFIG, search_type='websearch'
+        )
+        return queryset.filter(search_vector=search_query).annotate(
+            search_rank=SearchRank(F('search_vector'), search_query)
+        )
+    match = _fts_query(query)
+    if not match:
+        return queryset.none()
+    # Ранжирующие функции FTS5 работают только при соединении с самой
+    # виртуальной таблицей, поэтому таблица подключается через extra().
+    return queryset.extra(
+        tables=[FTS_TABLE],
+        where=[
+            f'{FTS_TABLE}.rowid = recipes_recipe.id',
+            f'{FTS_TABLE} MATCH %s',
+        ],
+        params=[match],
+        select={'search_rank': f'-bm25({FTS_TABLE}, 10.0, 1.0, 5.0)'}
+    )
+
+
+def can_filter_by_rank():
+    """Можно ли фильтровать по search_rank, как делает курсорная пагинация.
+
+    На SQLite релевантность приходит из extra(), а не из аннотации.
+    """
+    return connection.vendor == 'postgresql'
+
+
+def is_search_ranked(queryset):
+    """Проверяет, аннотирован ли queryset релевантностью поиска."""
+    return ('search_rank' in queryset.query.annotations
+            or 'search_rank' in queryset.query.extra_select)
@@ -0,0 +1,48 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from api.images import run_in_background
+from users.models import Subscription
+
+from .feed import backfill, fan_out, remove_author
+from .models import Ingredient, Recipe
+from .search import remove_from_search_index, update_search_index
+
+
+@receiver(post_save, sender=Recipe)
+def index_recipe(instance, **kwargs):
+    # Ингредиенты записываются после save(), поэтому ждем коммита.
+    transaction.on_commit(lambda: update_search_index([instance.pk]))
+
+
+@receiver(post_delete, sender=Recipe)
+def unindex_recipe(instance, **kwargs):
+    remove_from_search_index(instance.pk)
+
+
+@receiver(post_save, sender=Ingredient)
+def reindex_ingredient_recipes(instance, created, **kwargs):
+    if not created:
+        update_search_index(
+            instance.recipes.values_list('pk', flat=True)
+        )
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_recipe(instance, created, **kwargs):
+    # У автора могут быть тысячи подписчиков: ленты заполняются в фоне,
+    # а не в запросе, создавшем рецепт.
+    if created:
+        run_in_background(fan_out, instance)
+
+
+@receiver(post_save, sender=Subscription)
+def backfill_feed(instance, created, **kwargs):
+    if created:
+        backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Subscription)
+def clean_feed(instance, **kwargs):
+    remove_author(instance.user_id, instance.author_id)
@@ -0,0 +1,95 @@
+import pytest
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.test import APIClient
+
+from recipes.models import (Favourite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from users.models import Subscription, User
+
+
+@pytest.fixture(scope='session')
+def django_db_modify_db_settings(django_db_modify_db_settings_parallel_suffix,
+                                 tmp_path_factory):
+    # Потокам в тестах на конкурентность нужна общая база в файле,
+    # а не SQLite в памяти.
+    database = settings.DATABASES['default']
+    if database['ENGINE'].endswith('sqlite3'):
+        database.setdefault('TEST', {})['NAME'] = str(
+            tmp_path_factory.mktemp('db') / 'test.sqlite3'
+        )
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(settings, tmp_path):
+    settings.CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tests',
+    }}
+    settings.MEDIA_ROOT = tmp_path / 'media'
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def user(django_user_model):
+    return django_user_model.objects.create_user(
+        username='reader', email='reader@example.com', password='password'
+    )
+
+
+@pytest.fixture
+def user_client(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+@pytest.fixture
+def make_recipes(db):
+    return create_recipes
+
+
+def create_recipes(count, ingredients_per_recipe=5, reader=None):
+    """Авторы, теги, ингредиенты и рецепты; reader получает избранное,
+    список покупок и подписку на первого автора.
+    """
+    authors = [
+        User.objects.create_user(
+            username=f'author{index}', email=f'author{index}@example.com',
+            password='password'
+        )
+        for index in range(3)
+    ]
+    tags = [
+        Tag.objects.create(name=f'Тег {index}', slug=f'tag{index}')
+        for index in range(2)
+    ]
+    Ingredient.objects.bulk_create([
+        Ingredient(name=f'Ингредиент {index}', measurement_unit='г')
+        for index in range(ingredients_per_recipe + count)
+    ])
+    ingredients = list(Ingredient.objects.order_by('pk'))
+    recipes = []
+    for index in range(count):
+        recipe = Recipe.objects.create(
+            author=authors[index % len(authors)], name=f'Рецепт {index}',
+            image='recipes/images/test.png', text='Текст', cooking_time=10
+        )
+        recipe.tags.set(tags)
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(
+                recipe=recipe, ingredient=ingredient, amount=amount + 1
+            )
+            for amount, ingredient in enumerate(
+                ingredients[index:index + ingredients_per_recipe]
+            )
+        ])
+        if reader is not None and index % 2:
+            Favourite.objects.create(user=reader, recipe=recipe)
+            ShoppingCart.objects.create(user=reader, recipe=recipe)
+        recipes.append(recipe)
+    if reader is not None:
+        Subscription.objects.create(user=reader, author=authors[0])
+    return recipes
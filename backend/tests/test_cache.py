@@ -0,0 +1,142 @@
+import hashlib
+
+import pytest
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from api.cache import RECIPE_LIST_LOCK_KEY, bump_version
+from recipes.models import Ingredient, Tag
+
+
+@pytest.fixture
+def anonymous():
+    return APIClient()
+
+
+def names(response):
+    return [item['name'] for item in response.data['results']]
+
+
+@pytest.mark.django_db
+def test_recipe_list_cache_follows_generation(anonymous, make_recipes,
+                                              django_assert_num_queries):
+    make_recipes(3)
+    url = reverse('recipes-list')
+    first = anonymous.get(url)
+    with django_assert_num_queries(0):
+        assert anonymous.get(url).data == first.data
+
+    # Новый тег меняет поколение: запись пересобирается сразу.
+    Tag.objects.create(name='Новый', slug='new')
+    with django_assert_num_queries(4):
+        assert anonymous.get(url).status_code == 200
+
+
+@pytest.mark.django_db
+def test_recipe_list_serves_stale_while_locked(anonymous, make_recipes,
+                                               django_assert_num_queries):
+    recipe = make_recipes(3)[-1]
+    url = reverse('recipes-list')
+    old = names(anonymous.get(url))
+    recipe.name = 'Переименован'
+    recipe.save()
+    bump_version('recipe_list')
+    # Запись уже пересобирает другой запрос.
+    lock_key = RECIPE_LIST_LOCK_KEY.format(
+        'testserver', hashlib.md5(b'').hexdigest()
+    )
+    cache.add(lock_key, 1)
+
+    with django_assert_num_queries(0):
+        assert names(anonymous.get(url)) == old
+
+    cache.delete(lock_key)
+    assert names(anonymous.get(url))[0] == 'Переименован'
+    assert cache.get(lock_key) is None
+
+
+@pytest.mark.django_db
+def test_recipe_list_without_stale_window_rebuilds(anonymous, make_recipes,
+                                                   settings):
+    settings.RECIPE_LIST_CACHE_STALE = 0
+    recipe = make_recipes(3)[-1]
+    url = reverse('recipes-list')
+    anonymous.get(url)
+    recipe.name = 'Переименован'
+    recipe.save()
+    bump_version('recipe_list')
+    cache.add(RECIPE_LIST_LOCK_KEY.format(
+        'testserver', hashlib.md5(b'').hexdigest()
+    ), 1)
+
+    assert names(anonymous.get(url))[0] == 'Переименован'
+
+
+@pytest.mark.django_db
+def test_recipe_list_invalidated_by_recipe_update(
+    anonymous, make_recipes, django_capture_on_commit_callbacks
+):
+    recipe = make_recipes(3)[-1]
+    url = reverse('recipes-list')
+    anonymous.get(url)
+    author = APIClient()
+    author.force_authenticate(recipe.author)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        response = author.patch(
+            reverse('recipes-detail', args=(recipe.pk,)),
+            {'name': 'Переименован'}, format='json'
+        )
+    assert response.status_code == 200
+
+    assert names(anonymous.get(url))[0] == 'Переименован'
+
+
+@pytest.mark.django_db
+def test_catalog_etag(anonymous, make_recipes, django_assert_num_queries):
+    make_recipes(1)
+    url = reverse('tags-list')
+    response = anonymous.get(url)
+    etag = response['ETag']
+    assert response.status_code == 200
+
+    with django_assert_num_queries(0):
+        response = anonymous.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+    assert response['ETag'] == etag
+
+    Tag.objects.create(name='Новый', slug='new')
+    response = anonymous.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response['ETag'] != etag
+    assert 'Новый' in response.content.decode()
+
+
+@pytest.mark.django_db
+def test_recipe_detail_invalidated_by_author_change(
+    user_client, make_recipes, django_capture_on_commit_callbacks
+):
+    recipe = make_recipes(1)[0]
+    url = reverse('recipes-detail', args=(recipe.pk,))
+    assert user_client.get(url).data['author']['first_name'] == ''
+
+    recipe.author.first_name = 'Анна'
+    with django_capture_on_commit_callbacks(execute=True):
+        recipe.author.save()
+
+    assert user_client.get(url).data['author']['first_name'] == 'Анна'
+
+
+@pytest.mark.django_db
+def test_recipe_detail_invalidated_by_ingredient_change(user_client,
+                                                        make_recipes):
+    recipe = make_recipes(1)[0]
+    url = reverse('recipes-detail', args=(recipe.pk,))
+    ingredient_id = user_client.get(url).data['ingredients'][0]['id']
+
+    ingredient = Ingredient.objects.get(pk=ingredient_id)
+    ingredient.name = 'Соль'
+    ingredient.save()
+
+    assert user_client.get(url).data['ingredients'][0]['name'] == 'Соль'
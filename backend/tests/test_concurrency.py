@@ -0,0 +1,115 @@
+import sys
+import threading
+
+import pytest
+from django.db import connections, transaction
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from api.serializers import RecipeWriteSerializer
+from recipes.models import (Favourite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart)
+from users.models import Subscription
+
+THREADS = 8
+
+
+def hammer(user, method, url, data=None):
+    """Отправляет один и тот же запрос из THREADS потоков одновременно."""
+    barrier = threading.Barrier(THREADS)
+    statuses = []
+
+    def worker():
+        client = APIClient()
+        client.force_authenticate(user)
+        try:
+            barrier.wait()
+            response = getattr(client, method)(url, data, format='json')
+            statuses.append(response.status_code)
+        finally:
+            connections.close_all()
+
+    # Частое переключение потоков, чтобы запросы действительно
+    # перемешивались, а не выполнялись по очереди за один квант.
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    return sorted(statuses)
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize('action, model, counter', (
+    ('favorite', Favourite, 'favorites_count'),
+    ('shopping-cart', ShoppingCart, 'in_carts_count'),
+))
+def test_concurrent_add_creates_one_row(user, make_recipes, action, model,
+                                        counter):
+    recipe = make_recipes(1)[0]
+    url = reverse(f'recipes-{action}', args=(recipe.pk,))
+
+    statuses = hammer(user, 'post', url)
+
+    assert statuses == [201] + [400] * (THREADS - 1)
+    recipe.refresh_from_db()
+    assert getattr(recipe, counter) == 1
+    assert model.objects.filter(recipe=recipe).count() == 1
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_subscribe_creates_one_row(user, make_recipes):
+    author = make_recipes(1)[0].author
+    url = reverse('users-subscribe', args=(author.pk,))
+
+    assert hammer(user, 'post', url) == [201] + [400] * (THREADS - 1)
+    assert Subscription.objects.filter(user=user, author=author).count() == 1
+
+    assert hammer(user, 'delete', url) == [204] + [400] * (THREADS - 1)
+    assert not Subscription.objects.filter(user=user).exists()
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize('action, model, counter', (
+    ('favorite-bulk', Favourite, 'favorites_count'),
+    ('shopping-cart-bulk', ShoppingCart, 'in_carts_count'),
+))
+def test_concurrent_bulk_keeps_counters_exact(user, make_recipes, action,
+                                              model, counter):
+    recipes = make_recipes(3)
+    url = reverse(f'recipes-{action}')
+    data = {'recipes': [recipe.pk for recipe in recipes]}
+
+    for method, expected in (('post', 1), ('delete', 0)) * 3:
+        assert set(hammer(user, method, url, data)) == {200}
+        for recipe in Recipe.objects.filter(pk__in=data['recipes']):
+            assert getattr(recipe, counter) == expected
+            assert model.objects.filter(recipe=recipe).count() == expected
+
+
+@pytest.mark.django_db
+def test_update_ingredients_ignores_stale_prefetch(make_recipes):
+    recipe = make_recipes(1)[0]
+    stale = Recipe.objects.prefetch_related('recipe_ingredients').get(
+        pk=recipe.pk
+    )
+    # Пока запрос держал кэш prefetch, параллельный PATCH заменил состав.
+    ingredient = Ingredient.objects.create(name='Соль', measurement_unit='г')
+    RecipeIngredient.objects.filter(recipe=recipe).delete()
+    RecipeIngredient.objects.create(
+        recipe=recipe, ingredient=ingredient, amount=1
+    )
+
+    with transaction.atomic():
+        RecipeWriteSerializer().update_ingredients(
+            stale, [{'ingredient': ingredient, 'amount': 5}]
+        )
+
+    assert list(RecipeIngredient.objects.filter(recipe=recipe).values_list(
+        'ingredient_id', 'amount'
+    )) == [(ingredient.pk, 5)]
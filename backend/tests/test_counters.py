@@ -0,0 +1,42 @@
+import pytest
+from django.urls import reverse
+
+from recipes.models import Favourite, ShoppingCart
+
+RELATED = (
+    ('favorite', Favourite, 'favorites_count'),
+    ('shopping-cart', ShoppingCart, 'in_carts_count'),
+)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('action, model, counter', RELATED)
+def test_remove_row_created_outside_api(user, user_client, make_recipes,
+                                        action, model, counter):
+    recipe = make_recipes(1)[0]
+    # Как при создании в админке: счетчик не увеличен.
+    model.objects.create(user=user, recipe=recipe)
+
+    response = user_client.delete(
+        reverse(f'recipes-{action}', args=(recipe.pk,))
+    )
+
+    assert response.status_code == 204
+    recipe.refresh_from_db()
+    assert getattr(recipe, counter) == 0
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('action, model, counter', RELATED)
+def test_add_counts_rows_created_outside_api(user, user_client, make_recipes,
+                                             action, model, counter):
+    recipe = make_recipes(1)[0]
+    model.objects.create(user=recipe.author, recipe=recipe)
+
+    response = user_client.post(
+        reverse(f'recipes-{action}', args=(recipe.pk,))
+    )
+
+    assert response.status_code == 201
+    recipe.refresh_from_db()
+    assert getattr(recipe, counter) == 2
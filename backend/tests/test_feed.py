@@ -0,0 +1,28 @@
+import pytest
+
+from api.images import _executor
+from recipes.models import FeedItem, Recipe
+from users.models import Subscription
+
+
+@pytest.mark.django_db(transaction=True)
+def test_fan_out_runs_in_background(user, make_recipes, monkeypatch):
+    submitted = []
+    monkeypatch.setattr(_executor, 'submit',
+                        lambda *args: submitted.append(args))
+    author = make_recipes(1)[0].author
+    Subscription.objects.create(user=user, author=author)
+    submitted.clear()
+
+    recipe = Recipe.objects.create(
+        author=author, name='Новый', image='recipes/images/test.png',
+        text='Текст', cooking_time=10
+    )
+
+    # Запрос, создавший рецепт, ленты подписчиков не заполняет.
+    assert not FeedItem.objects.filter(recipe=recipe).exists()
+    for function, *args in submitted:
+        function(*args)
+    assert list(FeedItem.objects.filter(recipe=recipe).values_list(
+        'user_id', flat=True
+    )) == [user.pk]
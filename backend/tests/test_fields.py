@@ -0,0 +1,77 @@
+import base64
+from io import BytesIO
+
+import pytest
+from django.core.files.uploadedfile import (InMemoryUploadedFile,
+                                            TemporaryUploadedFile)
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+
+from api.fields import Base64ImageField
+
+
+def make_png(size=(40, 30)):
+    buffer = BytesIO()
+    Image.effect_noise(size, 64).convert('RGB').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def data_uri(content, content_type='image/png', encode=base64.b64encode):
+    return f'data:{content_type};base64,{encode(content).decode()}'
+
+
+def error_code(field, data):
+    with pytest.raises(ValidationError) as error:
+        field.to_internal_value(data)
+    return error.value.detail[0].code
+
+
+@pytest.mark.parametrize('chunk_size', (8, 61, 64 * 1024))
+def test_decode_accepts_whitespace_between_chunks(monkeypatch, chunk_size):
+    monkeypatch.setattr('api.fields.BASE64_CHUNK_SIZE', chunk_size)
+    png = make_png()
+    # encodebytes переносит строки каждые 76 символов, как почтовые клиенты.
+    data = data_uri(png, encode=base64.encodebytes)
+    data = data[:50] + ' \t ' + data[50:]
+
+    file = Base64ImageField().to_internal_value(data)
+
+    assert file.read() == png
+
+
+def test_decode_rejects_oversized_image():
+    png = make_png()
+    field = Base64ImageField(max_size=len(png) - 1)
+
+    assert error_code(field, data_uri(png)) == 'image_too_large'
+
+
+def test_decode_rejects_disallowed_type():
+    assert error_code(
+        Base64ImageField(), data_uri(b'<svg/>', 'image/svg+xml')
+    ) == 'image_type'
+
+
+@pytest.mark.parametrize('payload', (
+    'data:image/png;base64,' + '@' * 8,
+    'data:image/png;base64,iVBORw0KGgo',
+    'data:image/png,iVBORw0KGgo=',
+))
+def test_decode_rejects_invalid_base64(payload):
+    assert error_code(Base64ImageField(), payload) == 'invalid_base64'
+
+
+@pytest.mark.parametrize('memory_limit, upload_class', (
+    (10 * 1024 * 1024, InMemoryUploadedFile),
+    (100, TemporaryUploadedFile),
+))
+def test_decode_spools_large_images_to_disk(settings, memory_limit,
+                                            upload_class):
+    settings.FILE_UPLOAD_MAX_MEMORY_SIZE = memory_limit
+    png = make_png((200, 200))
+
+    file = Base64ImageField().to_internal_value(data_uri(png))
+
+    assert type(file) is upload_class
+    assert file.size == len(png)
+    assert file.read() == png
@@ -0,0 +1,84 @@
+import base64
+from io import BytesIO
+
+import pytest
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from PIL import Image
+
+from api.images import build_variants
+from recipes.models import Recipe
+
+
+def make_png():
+    buffer = BytesIO()
+    Image.new('RGB', (300, 200), (200, 100, 50)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def save_image(name):
+    return default_storage.save(name, ContentFile(make_png()))
+
+
+def with_variants(instance, field_name, variants_field):
+    name = save_image(f'{instance._meta.model_name}.png')
+    type(instance).objects.filter(pk=instance.pk).update(**{field_name: name})
+    # build_variants закрывает соединение с базой, как в рабочем потоке,
+    # поэтому тестам нужны настоящие транзакции.
+    build_variants(type(instance), instance.pk, field_name, variants_field,
+                   name)
+    instance.refresh_from_db()
+    variants = list(getattr(instance, variants_field).values())
+    assert variants and all(map(default_storage.exists, variants))
+    return variants
+
+
+@pytest.mark.django_db(transaction=True)
+def test_recipe_delete_removes_variants(make_recipes):
+    recipe = make_recipes(1)[0]
+    variants = with_variants(recipe, 'image', 'image_variants')
+
+    recipe.delete()
+
+    assert not any(map(default_storage.exists, variants))
+
+
+@pytest.mark.django_db(transaction=True)
+def test_avatar_delete_removes_variants(user, user_client):
+    variants = with_variants(user, 'avatar', 'avatar_variants')
+
+    response = user_client.delete(reverse('users-avatar'))
+
+    assert response.status_code == 204
+    assert not any(map(default_storage.exists, variants))
+
+
+@pytest.mark.django_db(transaction=True)
+def test_avatar_replace_removes_old_variants(user, user_client, monkeypatch):
+    variants = with_variants(user, 'avatar', 'avatar_variants')
+    # Новые варианты строятся в фоне и здесь не нужны.
+    monkeypatch.setattr('api.serializers.schedule_variants',
+                        lambda *args: None)
+
+    response = user_client.put(reverse('users-avatar'), {
+        'avatar': 'data:image/png;base64,'
+                  + base64.b64encode(make_png()).decode()
+    }, format='json')
+
+    assert response.status_code == 200
+    assert not any(map(default_storage.exists, variants))
+    user.refresh_from_db()
+    assert user.avatar_variants == {}
+
+
+@pytest.mark.django_db(transaction=True)
+def test_variants_of_replaced_image_are_not_kept(make_recipes):
+    recipe = make_recipes(1)[0]
+    stale = save_image('stale.png')
+
+    build_variants(Recipe, recipe.pk, 'image', 'image_variants', stale)
+
+    recipe.refresh_from_db()
+    assert recipe.image_variants == {}
+    assert default_storage.listdir('')[1] == ['stale.png']
@@ -0,0 +1,30 @@
+import pytest
+from django.db import connection
+
+from api.views import RecipeViewSet
+from recipes.models import Recipe
+
+
+@pytest.fixture
+def seeded(make_recipes):
+    recipes = make_recipes(30)
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+            # На маленькой таблице планировщик PostgreSQL выберет seq scan.
+            cursor.execute('SET LOCAL enable_seqscan = off')
+    return recipes
+
+
+@pytest.mark.django_db
+def test_recipe_list_ordering_uses_pub_date_index(seeded):
+    queryset = Recipe.objects.order_by(*RecipeViewSet.ordering)[:6]
+    assert 'recipe_pub_date_idx' in queryset.explain()
+
+
+@pytest.mark.django_db
+def test_author_filter_uses_author_pub_date_index(seeded):
+    queryset = Recipe.objects.filter(
+        author=seeded[0].author
+    ).order_by(*RecipeViewSet.ordering)[:6]
+    assert 'recipe_author_pub_date_idx' in queryset.explain()
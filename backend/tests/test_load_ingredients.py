@@ -0,0 +1,63 @@
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from recipes.management.commands.load_ingredients import read_json
+from recipes.models import Ingredient
+
+INGREDIENTS = [
+    {'name': f'Ингредиент "{index}"', 'measurement_unit': 'г'}
+    for index in range(7)
+]
+
+
+@pytest.fixture(autouse=True)
+def small_reads(monkeypatch):
+    # Куски в несколько байт режут объекты и строки на границах чтения.
+    monkeypatch.setattr(
+        'recipes.management.commands.load_ingredients.IMPORT_READ_SIZE', 5
+    )
+
+
+@pytest.mark.parametrize('indent', (None, 4))
+def test_read_json_splits_items_across_reads(indent):
+    rows = read_json(StringIO(json.dumps(
+        INGREDIENTS, indent=indent, ensure_ascii=False
+    )))
+
+    assert list(rows) == [
+        (item['name'], item['measurement_unit']) for item in INGREDIENTS
+    ]
+
+
+@pytest.mark.parametrize('text', ('[]', ' [\n]\n', ''))
+def test_read_json_empty_array(text):
+    assert list(read_json(StringIO(text))) == []
+
+
+@pytest.mark.parametrize('text, message', (
+    ('{"name": "соль", "measurement_unit": "г"}', 'Ожидался JSON-массив'),
+    ('[{"name": "соль", "measurement_unit": }]', 'Некорректный JSON'),
+    ('[{"name": "соль", "measurement_unit": "г"', 'Некорректный JSON'),
+))
+def test_read_json_rejects_malformed_input(text, message):
+    with pytest.raises(CommandError, match=message):
+        list(read_json(StringIO(text)))
+
+
+@pytest.mark.django_db
+def test_load_ingredients_rerun_adds_nothing(tmp_path):
+    path = tmp_path / 'ingredients.json'
+    path.write_text(
+        json.dumps(INGREDIENTS, indent=2, ensure_ascii=False),
+        encoding='utf-8'
+    )
+
+    for added in (len(INGREDIENTS), 0):
+        out = StringIO()
+        call_command('load_ingredients', path=path, batch_size=3, stdout=out)
+        assert f'добавлено {added},' in out.getvalue()
+    assert Ingredient.objects.count() == len(INGREDIENTS)
@@ -0,0 +1,111 @@
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+
+from api.cache import RECIPE_VERSION, VERSION_KEY
+from api.metrics import metrics
+from api.utils import to_base36
+from recipes.models import Recipe
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('limit', (2, 10))
+def test_recipe_list_queries_do_not_grow_with_page_size(
+    user, user_client, make_recipes, django_assert_num_queries, limit
+):
+    make_recipes(12, reader=user)
+    # recipes + count, ингредиенты, теги, подписки пользователя.
+    with django_assert_num_queries(5):
+        response = user_client.get(
+            reverse('recipes-list'), {'limit': limit}
+        )
+    assert response.status_code == 200
+    assert len(response.data['results']) == limit
+    assert any(item['is_favorited'] for item in response.data['results'])
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('ingredients', (2, 20))
+def test_recipe_retrieve_queries_are_constant(
+    user, user_client, make_recipes, django_assert_num_queries, ingredients
+):
+    recipe = make_recipes(2, ingredients_per_recipe=ingredients,
+                          reader=user)[1]
+    url = reverse('recipes-detail', args=(recipe.pk,))
+    with django_assert_num_queries(4):
+        response = user_client.get(url)
+    assert len(response.data['ingredients']) == ingredients
+    assert response.data['is_favorited']
+    # Повторный запрос берет карточку из кэша, флаги - одним запросом.
+    with django_assert_num_queries(1):
+        cached = user_client.get(url)
+    assert cached.data == response.data
+
+
+@pytest.mark.django_db
+def test_recipe_retrieve_unknown_recipe(user_client):
+    pk = Recipe.objects.count() + 1
+    response = user_client.get(reverse('recipes-detail', args=(pk,)))
+    assert response.status_code == 404
+    # Перебор несуществующих pk не оставляет в кэше версий рецептов.
+    assert cache.get(VERSION_KEY.format(RECIPE_VERSION.format(pk))) is None
+
+
+@pytest.mark.django_db
+def test_short_link_checks_database_only_above_known_ids(
+    client, make_recipes, django_assert_num_queries
+):
+    first, deleted, last = make_recipes(3)
+    deleted_pk = deleted.pk
+    deleted.delete()
+    # Первый запрос строит карту id.
+    assert client.get(f'/s/{to_base36(first.pk)}/').status_code == 302
+
+    with django_assert_num_queries(0):
+        assert client.get(f'/s/{to_base36(last.pk)}/').status_code == 302
+        assert client.get(f'/s/{to_base36(deleted_pk)}/').status_code == 404
+    # Рецепт новее карты, например из другого процесса, ищется в базе.
+    newer = Recipe.objects.create(
+        author=first.author, name='Новый', image=first.image.name,
+        text='Текст', cooking_time=10
+    )
+    with django_assert_num_queries(1):
+        assert client.get(f'/s/{to_base36(newer.pk)}/').status_code == 302
+    with django_assert_num_queries(1):
+        response = client.get(f'/s/{to_base36(newer.pk + 1)}/')
+    assert response.status_code == 404
+
+
+def view_metric(name, view):
+    prefix = f'foodgram_{name}{{view="{view}"}} '
+    for line in metrics.render().splitlines():
+        if line.startswith(prefix):
+            return float(line[len(prefix):])
+    return 0
+
+
+@pytest.mark.django_db
+def test_streaming_response_metrics_include_stream(user, user_client,
+                                                   make_recipes):
+    make_recipes(4, reader=user)
+    url = reverse('recipes-download-shopping-cart')
+    view = resolve(url).view_name
+    before = {
+        name: view_metric(name, view)
+        for name in ('requests_total', 'db_queries_total',
+                     'response_bytes_total')
+    }
+    with CaptureQueriesContext(connection) as context:
+        response = user_client.get(url)
+        # Пока поток не прочитан, запрос в метриках не учтен.
+        assert view_metric('requests_total', view) == before['requests_total']
+        content = b''.join(response.streaming_content)
+
+    assert content
+    assert view_metric('requests_total', view) == before['requests_total'] + 1
+    assert (view_metric('db_queries_total', view)
+            - before['db_queries_total']) == len(context.captured_queries)
+    assert (view_metric('response_bytes_total', view)
+            - before['response_bytes_total']) == len(content)
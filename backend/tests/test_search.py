@@ -0,0 +1,27 @@
+import pytest
+from django.urls import reverse
+
+from recipes.search import update_search_index
+
+
+@pytest.mark.django_db
+def test_cursor_search_follows_next_through_all_results(user_client,
+                                                        make_recipes):
+    recipes = make_recipes(5)
+    update_search_index(recipe.pk for recipe in recipes)
+
+    response = user_client.get(reverse('recipes-list'), {
+        'search': 'Рецепт', 'pagination': 'cursor', 'limit': 2
+    })
+    found = []
+    pages = 0
+    while True:
+        assert response.status_code == 200
+        found.extend(item['id'] for item in response.data['results'])
+        pages += 1
+        if not response.data['next']:
+            break
+        response = user_client.get(response.data['next'])
+
+    assert pages == 3
+    assert sorted(found) == sorted(recipe.pk for recipe in recipes)
@@ -26,6 +26,12 @@ class User(AbstractUser):
         null=True,
         default=''
     )
+    avatar_variants = models.JSONField(
+        'Варианты аватара',
+        default=dict,
+        blank=True,
+        editable=False
+    )
     subscriptions = models.ManyToManyField(
         'self',
         symmetrical=False,